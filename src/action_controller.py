@@ -1,34 +1,152 @@
-import pyautogui
+import threading
 import time
+from collections import deque
+from action_registry import DEFAULT_ACTIONS, POINTER_ACTIONS, compile_actions
+from input_backends import create_backend
+from metrics import StageTimings
 
 class ActionController:
-    def __init__(self):
-        self.actions = {
-            "Copy": self.copy,
-            "Paste": self.paste,
-            "Refresh": self.refresh,
-            "Zoom In": self.zoom_in,
-            "Zoom Out": self.zoom_out,
-        }
+    # Discrete actions waiting at most; mouse transitions are never dropped so buttons can't get stuck
+    MAX_QUEUED = 16
+
+    # backend is an InputBackend or its name, definitions are action definitions from config.json
+    def __init__(self, backend = None, definitions = None):
+        if backend is None or isinstance(backend, str):
+            backend = create_backend(backend or "pyautogui")
+        self.backend = backend
+        self.actions, self.continuous_actions = compile_actions(definitions or DEFAULT_ACTIONS, backend)
+        # gesture_to_action runs from the camera frame's capture to the finished backend call
+        self.timings = StageTimings(["queue", "perform", "mouse", "gesture_to_action"])
+
+        # Actions run on a dispatch thread so slow OS input calls never stall recognition.
+        # Everything goes through one FIFO, which keeps mouse downs and ups in order
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = True
+        # Button state as of the last queued transition, used to drop redundant downs and ups
+        self.buttons_down = set()
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target = self.dispatch_loop, daemon = True)
+            self.thread.start()
+
+    # timestamp is the capture time of the frame that triggered the event, None for events that
+    # don't count towards the gesture to action latency
+    def enqueue(self, kind, argument, timestamp = None):
+        with self.condition:
+            if not self.running:
+                return
+            if kind == "mouse_down" or kind == "mouse_up":
+                # Pressing a pressed button or releasing a released one does nothing
+                if (argument in self.buttons_down) == (kind == "mouse_down"):
+                    self.coalesced += 1
+                    return
+                if kind == "mouse_down":
+                    self.buttons_down.add(argument)
+                else:
+                    self.buttons_down.discard(argument)
+            elif kind == "continuous":
+                # Steps of a continuous action that are still waiting are merged into one event
+                if self.queue and self.queue[-1][0] == "continuous" and self.queue[-1][1][0] == argument[0]:
+                    name, amount = argument
+                    self.queue[-1] = (kind, (name, self.queue[-1][1][1] + amount)) + self.queue[-1][2:]
+                    self.coalesced += 1
+                    return
+            elif sum(1 for item in self.queue if item[0] == "action") >= self.MAX_QUEUED:
+                # The oldest pending action is the least relevant one by now
+                for item in self.queue:
+                    if item[0] == "action":
+                        self.queue.remove(item)
+                        break
+                self.dropped += 1
+            self.queue.append((kind, argument, time.perf_counter(), timestamp))
+            self.condition.notify()
+        self.start()
+
+    def dispatch_loop(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue or not self.running)
+                if not self.queue:
+                    return
+                kind, argument, queued, timestamp = self.queue.popleft()
+            self.timings.record("queue", time.perf_counter() - queued)
+            start = time.perf_counter()
+            try:
+                if kind == "action":
+                    for function, args in self.actions[argument]:
+                        function(*args)
+                elif kind == "continuous":
+                    name, amount = argument
+                    self.continuous_actions[name][1](amount)
+                elif kind == "mouse_down":
+                    self.backend.mouse_down(argument)
+                else:
+                    self.backend.mouse_up(argument)
+            except KeyError:
+                self.failed += 1
+                print("Unknown action:", repr(argument))
+                continue
+            except Exception as e:
+                self.failed += 1
+                print("Action failed:", kind, argument, str(e))
+                continue
+            self.timings.record("mouse" if kind.startswith("mouse") else "perform", time.perf_counter() - start)
+            if timestamp is not None:
+                self.timings.record("gesture_to_action", time.monotonic() - timestamp)
 
-    def perform_action(self, action_name):
-        action = self.actions.get(action_name)
-        action()
+    def perform_action(self, action_name, timestamp = None):
+        self.enqueue("action", action_name, timestamp)
 
-    def copy(self):
-        pyautogui.hotkey("ctrl", "c")
+    # Sends amount output steps of a continuous action, e.g. scroll clicks or zoom steps
+    def perform_continuous(self, action_name, amount):
+        self.enqueue("continuous", (action_name, amount))
 
-    def paste(self):
-        pyautogui.hotkey("ctrl", "v")
+    # Tuning options of a continuous action, None for other actions
+    def get_continuous_action(self, action_name):
+        continuous = self.continuous_actions.get(action_name)
+        return continuous[0] if continuous else None
 
-    def refresh(self):
-        pyautogui.press("f5")
+    def mouse_down(self, button = "left", timestamp = None):
+        self.enqueue("mouse_down", button, timestamp)
 
-    def zoom_in(self):
-        pyautogui.hotkey("ctrl", "+")
+    def mouse_up(self, button = "left"):
+        self.enqueue("mouse_up", button)
 
-    def zoom_out(self):
-        pyautogui.hotkey("ctrl", "-")
+    # Cursor moves stay synchronous, they already run on the cursor thread
+    def move_cursor(self, x, y):
+        self.backend.move_cursor(x, y)
 
+    def get_cursor_position(self):
+        return self.backend.get_cursor_position()
+
+    def get_screen_size(self):
+        return self.backend.get_screen_size()
+
+    def get_metrics(self):
+        return {
+            "stages": self.timings.summary(),
+            "queued": len(self.queue),
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "failed": self.failed
+        }
+
+    # Every action a pose can be mapped to, configured ones first
     def get_actions(self):
-        return list(self.actions.keys())
\ No newline at end of file
+        return list(self.actions.keys()) + list(self.continuous_actions.keys()) + POINTER_ACTIONS
+
+    # Releases held buttons, runs what is still queued and ends the dispatch thread
+    def stop(self):
+        for button in list(self.buttons_down):
+            self.mouse_up(button)
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout = 1.0)
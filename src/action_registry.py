@@ -0,0 +1,118 @@
+import time
+from continuous_gestures import SOURCES
+
+# Actions are declared in the "actions" section of config.json, keyed by the name shown in the
+# pose menu. Each definition is compiled once into a flat list of (function, args) steps bound to
+# the input backend, so triggering an action only walks that list.
+#
+#   {"type": "hotkey", "keys": ["ctrl", "c"]}
+#   {"type": "key", "key": "f5"}
+#   {"type": "text", "text": "Hello"}
+#   {"type": "scroll", "amount": -5, "horizontal": false}
+#   {"type": "command", "command": ["notepad.exe"]}
+#   {"type": "macro", "steps": [{"action": "Copy"}, {"type": "wait", "seconds": 0.1}, {"type": "key", "key": "enter"}]}
+#
+# Continuous actions run for as long as their pose is held and send output in proportion to how
+# the hand moves, see continuous_gestures.py for the sources and tuning options:
+#
+#   {"type": "continuous", "source": "translation_y", "output": "scroll", "gain": -40}
+
+DEFAULT_ACTIONS = {
+    "Copy": {"type": "hotkey", "keys": ["ctrl", "c"]},
+    "Paste": {"type": "hotkey", "keys": ["ctrl", "v"]},
+    "Refresh": {"type": "key", "key": "f5"},
+    "Zoom In": {"type": "hotkey", "keys": ["ctrl", "+"]},
+    "Zoom Out": {"type": "hotkey", "keys": ["ctrl", "-"]},
+    "Scroll": {"type": "continuous", "source": "translation_y", "output": "scroll", "gain": -40.0},
+    "Pinch Zoom": {"type": "continuous", "source": "pinch", "output": "zoom", "gain": 8.0},
+    "Volume Knob": {"type": "continuous", "source": "rotation", "output": "volume", "gain": -10.0}
+}
+
+# Handled by the GestureController's cursor logic rather than dispatched as actions
+POINTER_ACTIONS = ["Right Click", "Left Click", "Mouse Mode", "Neutral"]
+
+class ActionDefinitionError(ValueError):
+    pass
+
+def compile_step(definition, backend, definitions, stack):
+    # A step can reference another named action
+    if "action" in definition:
+        name = definition["action"]
+        if name in stack:
+            raise ActionDefinitionError("Action refers to itself: " + " -> ".join(stack + [name]))
+        if name not in definitions:
+            raise ActionDefinitionError("Unknown action: " + str(name))
+        return compile_step(definitions[name], backend, definitions, stack + [name])
+
+    kind = definition.get("type")
+    try:
+        if kind == "hotkey":
+            return [(backend.hotkey, tuple(definition["keys"]))]
+        if kind == "key":
+            return [(backend.press, (definition["key"],))] * int(definition.get("presses", 1))
+        if kind == "text":
+            return [(backend.write, (str(definition["text"]),))]
+        if kind == "scroll":
+            return [(backend.scroll, (int(definition["amount"]), bool(definition.get("horizontal", False))))]
+        if kind == "command":
+            return [(backend.run_command, (definition["command"],))]
+        if kind == "wait":
+            return [(time.sleep, (float(definition["seconds"]),))]
+        if kind == "continuous":
+            raise ActionDefinitionError("Continuous actions can't be part of a macro")
+        if kind == "macro":
+            steps = []
+            for step in definition["steps"]:
+                steps.extend(compile_step(step, backend, definitions, stack))
+            return steps
+    except KeyError as e:
+        raise ActionDefinitionError(f"'{kind}' action is missing {e}")
+    raise ActionDefinitionError("Unknown action type: " + str(kind))
+
+def repeat(function, positive, negative):
+    def run(amount):
+        for _ in range(abs(amount)):
+            function(*(positive if amount > 0 else negative))
+    return run
+
+# Returns a function that sends a signed number of output steps
+def compile_output(output, backend):
+    if output == "scroll":
+        return lambda amount: backend.scroll(amount)
+    if output == "hscroll":
+        return lambda amount: backend.scroll(amount, True)
+    if output == "zoom":
+        return repeat(backend.hotkey, ("ctrl", "+"), ("ctrl", "-"))
+    if output == "volume":
+        return repeat(backend.press, ("volumeup",), ("volumedown",))
+    raise ActionDefinitionError("Unknown continuous output: " + str(output))
+
+def compile_continuous(definition, backend):
+    if definition.get("source") not in SOURCES:
+        raise ActionDefinitionError("Unknown continuous source: " + str(definition.get("source")))
+    config = {key: value for key, value in definition.items() if key not in ["type", "output"]}
+    return config, compile_output(definition.get("output"), backend)
+
+# Returns ({name: steps}, {name: (config, output function)}) for discrete and continuous actions,
+# definitions that fail to compile are reported and left out
+def compile_actions(definitions, backend):
+    actions = {}
+    continuous = {}
+    for name, definition in definitions.items():
+        if name in POINTER_ACTIONS:
+            print("Action name is reserved:", name)
+            continue
+        try:
+            if definition.get("type") == "continuous":
+                continuous[name] = compile_continuous(definition, backend)
+            else:
+                actions[name] = tuple(compile_step(definition, backend, definitions, [name]))
+        except (AttributeError, TypeError, ValueError) as e:
+            print(f"Invalid action '{name}':", str(e))
+    return actions, continuous
+
+# Names the pose menu offers for the given definitions, usable before an ActionController exists
+def action_names(definitions = None):
+    from input_backends import NullBackend
+    actions, continuous = compile_actions(definitions or DEFAULT_ACTIONS, NullBackend())
+    return list(actions) + list(continuous) + POINTER_ACTIONS
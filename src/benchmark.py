@@ -0,0 +1,276 @@
+# Headless benchmark for the recognition pipeline. Replays recorded frames or synthetic landmark
+# streams through GestureController without a webcam, display or real input events and reports
+# per-stage latency percentiles, throughput and CPU time per frame.
+#
+# Run from the repository root, for example:
+#   python src/benchmark.py --synthetic 1000 --hands 2
+#   python src/benchmark.py --video recording.mp4 --fps 30 --json report.json
+
+import argparse
+import json
+import threading
+import time
+import numpy as np
+from action_registry import POINTER_ACTIONS
+from camera_manager import CameraManager
+from gesture_controller import GestureController
+from pose_action_manager import PoseActionManager
+
+# Stands in for CameraManager. With an fps frames are published on a timer like a real camera,
+# without one every wait_for_frame call immediately gets the next frame (unthrottled).
+class ReplayCameraManager(CameraManager):
+    def __init__(self, frames, fps = None, loops = 1):
+        super().__init__(camera_index = None)
+        self.frames = frames
+        self.fps = fps
+        self.total = len(frames) * loops
+        self.finished = False
+
+    @classmethod
+    def from_video(cls, path, fps = None, limit = None):
+        import cv2
+        cap = cv2.VideoCapture(path)
+        frames = []
+        while limit is None or len(frames) < limit:
+            success, frame = cap.read()
+            if not success:
+                break
+            frames.append(frame)
+        cap.release()
+        return cls(frames, fps)
+
+    @classmethod
+    def from_array(cls, path, fps = None):
+        return cls(np.load(path, mmap_mode = "r"), fps)
+
+    @classmethod
+    def blank(cls, count, width = 640, height = 480, fps = None):
+        return cls([np.zeros((height, width, 3), dtype = np.uint8)], fps, loops = count)
+
+    def frame_at(self, index):
+        frame = np.asarray(self.frames[index % len(self.frames)])
+        frame.flags.writeable = False
+        return frame
+
+    def start(self):
+        self.running = True
+        if self.fps:
+            self.thread = threading.Thread(target = self.replay, daemon = True)
+            self.thread.start()
+
+    def replay(self):
+        interval = 1 / self.fps
+        next_time = time.monotonic()
+        for index in range(self.total):
+            if not self.running:
+                break
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.publish(self.frame_at(index), time.monotonic())
+            next_time += interval
+        self.finished = True
+
+    def wait_for_frame(self, after_seq = 0, timeout = None):
+        if self.fps:
+            return super().wait_for_frame(after_seq, timeout)
+        if self.latest_seq >= self.total:
+            self.finished = True
+            time.sleep(timeout or 0)
+            return None
+        self.publish(self.frame_at(self.latest_seq), time.monotonic())
+        return self.get_latest()
+
+    def stop(self):
+        self.running = False
+
+# Minimal objects shaped like MediaPipe's results so landmark streams can skip real detection
+class Landmark:
+    def __init__(self, x, y, z = 0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+class LandmarkList:
+    def __init__(self, points):
+        self.landmark = [Landmark(*point) for point in points]
+
+class Classification:
+    def __init__(self, label):
+        self.label = label
+
+class Handedness:
+    def __init__(self, label):
+        self.classification = [Classification(label)]
+
+class SyntheticResults:
+    def __init__(self, hands, labels):
+        self.multi_hand_landmarks = [LandmarkList(points) for points in hands] or None
+        self.multi_handedness = [Handedness(label) for label in labels] or None
+
+# Replaces the MediaPipe detector, landmarks has shape (frames, hands, 21, 2 or 3)
+class SyntheticHands:
+    def __init__(self, landmarks, labels = ("Right", "Left")):
+        self.landmarks = landmarks
+        self.labels = labels
+        self.index = 0
+
+    def process(self, rgb):
+        hands = self.landmarks[self.index % len(self.landmarks)]
+        self.index += 1
+        return SyntheticResults(hands, self.labels[:len(hands)])
+
+# Open hand template in normalized image coordinates, wrist first like MediaPipe
+HAND_TEMPLATE = np.array([
+    [0.50, 0.80],
+    [0.44, 0.76], [0.40, 0.71], [0.37, 0.66], [0.35, 0.62],
+    [0.46, 0.64], [0.45, 0.57], [0.45, 0.52], [0.45, 0.48],
+    [0.50, 0.63], [0.50, 0.55], [0.50, 0.50], [0.50, 0.45],
+    [0.54, 0.64], [0.55, 0.57], [0.55, 0.52], [0.55, 0.48],
+    [0.58, 0.66], [0.60, 0.61], [0.61, 0.57], [0.62, 0.54]
+], dtype = np.float32)
+
+# Random walk of a jittering hand, roughly what a user moving the cursor produces
+def synthetic_landmarks(count, hands = 1, seed = 0):
+    rng = np.random.default_rng(seed)
+    offsets = np.cumsum(rng.normal(0, 0.004, size = (count, hands, 1, 2)), axis = 0)
+    offsets = np.clip(offsets, -0.25, 0.25)
+    offsets[:, 1:, :, 0] -= 0.3
+    jitter = rng.normal(0, 0.003, size = (count, hands, 21, 2))
+    return (HAND_TEMPLATE + offsets + jitter).astype(np.float32)
+
+# Accepts every action the controller issues and only counts them
+class NullActionController:
+    def __init__(self, screen_size = (1920, 1080)):
+        self.screen_size = screen_size
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def perform_action(self, action_name, timestamp = None):
+        self.count(action_name)
+
+    def perform_continuous(self, action_name, amount):
+        self.count(action_name)
+
+    def get_continuous_action(self, action_name):
+        return None
+
+    def mouse_down(self, button = "left", timestamp = None):
+        self.count("mouse_down_" + button)
+
+    def mouse_up(self, button = "left"):
+        self.count("mouse_up_" + button)
+
+    def move_cursor(self, x, y):
+        self.count("move_cursor")
+
+    def get_cursor_position(self):
+        return (0, 0)
+
+    def get_screen_size(self):
+        return self.screen_size
+
+    def get_actions(self):
+        return list(POINTER_ACTIONS)
+
+def run_benchmark(camera, hands = None, config = None, timeout = 600):
+    action_sink = NullActionController()
+    controller = GestureController(camera, PoseActionManager(), action_sink, hands, config)
+    controller.model.warm_up()
+    # Frames by number of hands found, shows what ROI and downscaling settings cost in detection
+    hand_counts = {}
+    def count_hands(result):
+        hand_counts[len(result.hands)] = hand_counts.get(len(result.hands), 0) + 1
+    controller.subscribe(count_hands)
+
+    camera.start()
+    thread = threading.Thread(target = controller.run, daemon = True)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    thread.start()
+
+    deadline = wall_start + timeout
+    while time.perf_counter() < deadline:
+        if camera.finished and controller.last_seq >= camera.latest_seq:
+            break
+        time.sleep(0.01)
+
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+    controller.stop()
+    thread.join()
+    camera.stop()
+
+    frames = int(controller.timings.counts[controller.timings.stage_index["total"]])
+    return {
+        "frames": frames,
+        "frames_offered": camera.total,
+        "dropped_frames": camera.total - frames,
+        "wall_seconds": wall_time,
+        "fps": frames / wall_time if wall_time else 0.0,
+        "cpu_ms_per_frame": cpu_time * 1000 / frames if frames else 0.0,
+        "stages": controller.timings.summary(),
+        "hands": dict(sorted(hand_counts.items())),
+        "actions": dict(action_sink.counts)
+    }
+
+def print_report(report):
+    print(f"Frames: {report['frames']}/{report['frames_offered']} ({report['dropped_frames']} dropped)")
+    print(f"Throughput: {report['fps']:.1f} fps, CPU: {report['cpu_ms_per_frame']:.2f} ms/frame")
+    print(f"{'stage':<12}{'count':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<12}{stats['count']:>8}{stats['mean']:>9.3f}{stats['p50']:>9.3f}{stats['p90']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    print("Frames by hands found:", ", ".join(f"{hands}: {frames}" for hands, frames in report["hands"].items()))
+    if report["actions"]:
+        print("Actions:", ", ".join(f"{name} x{count}" for name, count in sorted(report["actions"].items())))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark the gesture recognition pipeline without a camera or display")
+    source = parser.add_mutually_exclusive_group(required = True)
+    source.add_argument("--video", help = "replay frames from a video file")
+    source.add_argument("--frames", help = "replay frames from a .npy array of BGR images")
+    source.add_argument("--landmarks", help = "replay a .npy landmark stream of shape (frames, hands, 21, 2) instead of detecting")
+    source.add_argument("--synthetic", type = int, metavar = "FRAMES", help = "generate a synthetic landmark stream")
+    parser.add_argument("--hands", type = int, default = 1, help = "hands in the synthetic stream")
+    parser.add_argument("--fps", type = float, help = "replay rate, unthrottled when omitted")
+    parser.add_argument("--width", type = int, default = 640)
+    parser.add_argument("--height", type = int, default = 480)
+    parser.add_argument("--roi", action = "store_true", help = "detect only around the previous frame's hands (recorded frames only)")
+    parser.add_argument("--detection-max-size", type = int, default = 0, help = "downscale detection input to this longest side")
+    parser.add_argument("--runtime", default = "auto", choices = ["auto", "numpy", "tflite"], help = "classifier runtime")
+    parser.add_argument("--precision", default = "float32", choices = ["float32", "dynamic", "float16", "int8"], help = "exported model variant")
+    parser.add_argument("--threads", type = int, help = "TFLite interpreter threads")
+    parser.add_argument("--json", help = "also write the report to this file")
+    args = parser.parse_args()
+
+    hands = None
+    if args.video:
+        camera = ReplayCameraManager.from_video(args.video, args.fps)
+    elif args.frames:
+        camera = ReplayCameraManager.from_array(args.frames, args.fps)
+    else:
+        landmarks = np.load(args.landmarks) if args.landmarks else synthetic_landmarks(args.synthetic, args.hands)
+        if landmarks.ndim == 3:
+            landmarks = landmarks[:, np.newaxis]
+        hands = SyntheticHands(landmarks)
+        camera = ReplayCameraManager.blank(len(landmarks), args.width, args.height, args.fps)
+
+    config = {
+        "roi": args.roi,
+        "detection_max_size": args.detection_max_size,
+        "runtime": args.runtime,
+        "precision": args.precision,
+        "threads": args.threads
+    }
+    report = run_benchmark(camera, hands, config)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent = 2)
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,106 @@
 import cv2
 import threading
 import time
+from metrics import RateMeter, StageTimings
 
 class CameraManager:
-    def __init__(self, camera_index = 0):
+    RING_SIZE = 4
+
+    def __init__(self, camera_index = 0, width = None, height = None, fps = None):
         self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.fps = fps
         self.cap = None
         self.running = False
-        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+
+        # Small ring of preallocated frame buffers that the capture thread reads into.
+        # A handed out frame stays valid until the camera has delivered RING_SIZE - 1 newer frames
+        self.ring = [None] * self.RING_SIZE
+        self.latest_seq = 0
+        self.latest_timestamp = None
         self.latest_frame = None
 
+        self.timings = StageTimings(["read"])
+        self.frame_rate = RateMeter()
+        self.failed_reads = 0
+
     def start(self):
         if self.running:
             return
         self.cap = cv2.VideoCapture(self.camera_index, cv2.CAP_DSHOW)
         if not self.cap.isOpened():
             raise RuntimeError("Cannot open camera: " + str(self.camera_index))
+
+        # Cameras pick the closest mode they support, unset values keep the driver's default
+        if self.width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
         self.running = True
         self.thread = threading.Thread(target = self.update_frames, daemon = True)
         self.thread.start()
 
     def update_frames(self):
         while self.running:
-            success, frame = self.cap.read()
-            if success:
-                with self.lock:
-                    self.latest_frame = frame.copy()
-            else:
+            # Read straight into the next slot so frames are never copied
+            slot = (self.latest_seq + 1) % self.RING_SIZE
+            buffer = self.ring[slot]
+            if buffer is not None:
+                buffer.flags.writeable = True
+            read_start = time.perf_counter()
+            success, frame = self.cap.read(buffer)
+            if not success:
+                self.failed_reads += 1
                 time.sleep(0.05)
+                continue
+            self.timings.record("read", time.perf_counter() - read_start)
+
+            # OpenCV allocates a new array when the buffer is missing or the resolution changed
+            self.ring[slot] = frame
+            frame.flags.writeable = False
+            self.publish(frame, time.monotonic())
+
+    def publish(self, frame, timestamp):
+        with self.condition:
+            self.latest_seq += 1
+            self.latest_timestamp = timestamp
+            self.latest_frame = frame
+            self.condition.notify_all()
+        self.frame_rate.tick(timestamp)
+
+    # Returns (seq, timestamp, frame) of the newest frame, the frame is a read-only shared buffer
+    def get_latest(self):
+        with self.condition:
+            return self.latest_seq, self.latest_timestamp, self.latest_frame
+
+    # Blocks until a frame newer than after_seq exists, returns None on timeout
+    def wait_for_frame(self, after_seq = 0, timeout = None):
+        with self.condition:
+            ready = self.condition.wait_for(lambda: self.latest_frame is not None and self.latest_seq > after_seq, timeout)
+            if not ready:
+                return None
+            return self.latest_seq, self.latest_timestamp, self.latest_frame
+
+    def get_metrics(self):
+        return {
+            "fps": self.frame_rate.rate(),
+            "frames": self.latest_seq,
+            "failed_reads": self.failed_reads,
+            "stages": self.timings.summary()
+        }
 
     def get_frame(self):
-        with self.lock:
-            if self.latest_frame is not None:
-                return self.latest_frame.copy()
-            return None
+        with self.condition:
+            return self.latest_frame
 
     def stop(self):
         self.running = False
         if self.cap and self.cap.isOpened():
             self.cap.release()
-        self.latest_frame = None
\ No newline at end of file
+        with self.condition:
+            self.latest_frame = None
+            self.condition.notify_all()
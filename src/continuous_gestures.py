@@ -0,0 +1,76 @@
+import math
+
+# Continuous gestures turn how a hand moves while a pose is held into proportional output, e.g.
+# scrolling by moving the hand up and down or zooming by pinching. Each frame the tracked
+# measurement's change is scaled by a gain and added to an accumulator, whole steps are sent at
+# most rate times per second so output events are batched instead of sent for every frame.
+
+WRIST = 0
+THUMB_TIP = 4
+INDEX_TIP = 8
+MIDDLE_MCP = 9
+
+SOURCES = ["pinch", "translation_x", "translation_y", "rotation"]
+
+DEFAULT_CONTINUOUS = {
+    # Output steps per unit of the source: hand sizes for pinch, image widths/heights for
+    # translation and radians for rotation. Scroll steps are wheel notches on every platform.
+    # Negative gains invert the direction.
+    "gain": 10.0,
+    # Per frame changes smaller than this are treated as jitter
+    "deadzone": 0.002,
+    # Exponential smoothing of the measurement, 1 disables it
+    "smoothing": 0.5,
+    # Most output events per second
+    "rate": 20.0
+}
+
+# Returns every source's current value for a MediaPipe hand
+def measure_hand(hand_landmarks):
+    points = hand_landmarks.landmark
+    wrist = points[WRIST]
+    middle = points[MIDDLE_MCP]
+    # Pinch is relative to the palm's length so it doesn't change with the distance to the camera
+    hand_size = math.hypot(middle.x - wrist.x, middle.y - wrist.y) or 1e-6
+    pinch = math.hypot(points[THUMB_TIP].x - points[INDEX_TIP].x, points[THUMB_TIP].y - points[INDEX_TIP].y) / hand_size
+    return {
+        "pinch": pinch,
+        # The image is mirrored, moving the hand right decreases x
+        "translation_x": 1 - (wrist.x + middle.x) / 2,
+        "translation_y": (wrist.y + middle.y) / 2,
+        "rotation": math.atan2(middle.x - wrist.x, wrist.y - middle.y)
+    }
+
+class ContinuousGesture:
+    def __init__(self, name, config):
+        self.name = name
+        self.config = dict(DEFAULT_CONTINUOUS, **config)
+        self.source = self.config["source"]
+        self.value = None
+        self.accumulated = 0.0
+        self.last_emit = None
+
+    # Returns the whole number of output steps to send now, 0 when nothing is due
+    def update(self, hand_landmarks, timestamp):
+        value = measure_hand(hand_landmarks)[self.source]
+        if self.value is None:
+            # The first frame only sets the reference point
+            self.value = value
+            self.last_emit = timestamp
+            return 0
+
+        delta = value - self.value
+        if self.source == "rotation":
+            delta = (delta + math.pi) % (2 * math.pi) - math.pi
+        smoothed_delta = delta * self.config["smoothing"]
+        self.value += smoothed_delta
+        if abs(smoothed_delta) >= self.config["deadzone"]:
+            self.accumulated += smoothed_delta * self.config["gain"]
+
+        if timestamp - self.last_emit < 1 / self.config["rate"]:
+            return 0
+        steps = int(self.accumulated)
+        if steps:
+            self.accumulated -= steps
+            self.last_emit = timestamp
+        return steps
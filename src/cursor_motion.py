@@ -0,0 +1,167 @@
+import math
+import numpy as np
+
+# Motion filters for the cursor. Filters are fed hand positions in screen pixels together with the
+# camera timestamp of the frame they came from and can extrapolate the position to a later time,
+# which is used to hide the latency between the camera and the cursor.
+
+class PassthroughFilter:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.timestamp = None
+
+    def update(self, position, timestamp):
+        self.position = np.asarray(position, dtype = np.float64)
+        self.timestamp = timestamp
+
+    def predict(self, timestamp):
+        return self.position
+
+# One Euro filter (Casiez et al.): a low-pass filter whose cutoff rises with speed, smooth when the
+# hand is still and responsive when it moves fast
+class OneEuroFilter:
+    def __init__(self, min_cutoff = 1.0, beta = 0.01, d_cutoff = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = None
+        self.timestamp = None
+
+    @staticmethod
+    def alpha(cutoff, dt):
+        tau = 1 / (2 * math.pi * cutoff)
+        return 1 / (1 + tau / dt)
+
+    def update(self, position, timestamp):
+        position = np.asarray(position, dtype = np.float64)
+        if self.position is None:
+            self.position = position
+            self.velocity = np.zeros(2)
+            self.timestamp = timestamp
+            return
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return
+
+        raw_velocity = (position - self.position) / dt
+        self.velocity += self.alpha(self.d_cutoff, dt) * (raw_velocity - self.velocity)
+        cutoff = self.min_cutoff + self.beta * np.linalg.norm(self.velocity)
+        self.position = self.position + self.alpha(cutoff, dt) * (position - self.position)
+        self.timestamp = timestamp
+
+    def predict(self, timestamp):
+        if self.position is None:
+            return None
+        return self.position + self.velocity * max(0.0, timestamp - self.timestamp)
+
+# Constant velocity Kalman filter, run independently on both axes. process_noise is the variance of
+# the hand's acceleration (px^2/s^4) and measurement_noise the variance of landmark jitter (px^2).
+class KalmanFilter:
+    def __init__(self, process_noise = 2e6, measurement_noise = 9.0):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = None
+        self.timestamp = None
+
+    def update(self, position, timestamp):
+        position = np.asarray(position, dtype = np.float64)
+        if self.position is None:
+            self.position = position
+            self.velocity = np.zeros(2)
+            # Covariance entries per axis, velocity starts out unknown
+            self.p00 = np.full(2, self.measurement_noise)
+            self.p01 = np.zeros(2)
+            self.p11 = np.full(2, 1e6)
+            self.timestamp = timestamp
+            return
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return
+
+        # Predict
+        q = self.process_noise
+        self.position = self.position + self.velocity * dt
+        p00 = self.p00 + dt * 2 * self.p01 + dt * dt * self.p11 + q * dt ** 4 / 4
+        p01 = self.p01 + dt * self.p11 + q * dt ** 3 / 2
+        p11 = self.p11 + q * dt * dt
+
+        # Correct
+        s = p00 + self.measurement_noise
+        k0 = p00 / s
+        k1 = p01 / s
+        innovation = position - self.position
+        self.position = self.position + k0 * innovation
+        self.velocity = self.velocity + k1 * innovation
+        self.p00 = (1 - k0) * p00
+        self.p01 = (1 - k0) * p01
+        self.p11 = p11 - k1 * p01
+        self.timestamp = timestamp
+
+    def predict(self, timestamp):
+        if self.position is None:
+            return None
+        return self.position + self.velocity * max(0.0, timestamp - self.timestamp)
+
+def create_filter(config):
+    name = config.get("filter", "one_euro")
+    if name == "one_euro":
+        return OneEuroFilter(**config.get("one_euro", {}))
+    if name == "kalman":
+        return KalmanFilter(**config.get("kalman", {}))
+    if name == "none":
+        return PassthroughFilter()
+    raise ValueError("Unknown cursor filter: " + name)
+
+# Maps normalized camera coordinates to the screen. Only the active area of the camera image is
+# used so the screen edges can be reached without the hand leaving the frame. With acceleration
+# the cursor follows the hand's movement scaled by a speed dependent gain instead of its position.
+class CursorMapper:
+    def __init__(self, screen_width, screen_height, active_area = (0.0, 0.0, 1.0, 1.0), acceleration = None):
+        self.screen_size = np.array([screen_width, screen_height], dtype = np.float64)
+        self.active_area = active_area
+        acceleration = acceleration or {}
+        self.factor = acceleration.get("factor", 0.0)
+        self.exponent = acceleration.get("exponent", 1.0)
+        # Speed in px/s at which the gain reaches 1 + factor
+        self.reference_speed = acceleration.get("reference_speed", 1000.0)
+        self.max_gain = acceleration.get("max_gain", 3.0)
+        self.reset()
+
+    def reset(self):
+        self.last_hand = None
+        self.last_time = None
+        self.cursor = None
+
+    def to_screen(self, x, y):
+        x0, y0, x1, y1 = self.active_area
+        # The camera image is mirrored so moving the hand right moves the cursor right
+        screen_x = (1 - (x - x0) / (x1 - x0)) * self.screen_size[0]
+        screen_y = (y - y0) / (y1 - y0) * self.screen_size[1]
+        return np.array([screen_x, screen_y])
+
+    # Turns a filtered hand position into the cursor position
+    def apply(self, hand, timestamp):
+        if self.factor == 0 or self.cursor is None:
+            self.cursor = np.array(hand, dtype = np.float64)
+        else:
+            delta = hand - self.last_hand
+            dt = timestamp - self.last_time
+            speed = np.linalg.norm(delta) / dt if dt > 0 else 0.0
+            gain = min(self.max_gain, 1 + self.factor * (speed / self.reference_speed) ** self.exponent)
+            self.cursor = self.cursor + delta * gain
+        # One pixel away from the edges: the screen corners are pyautogui's fail-safe points
+        self.cursor = np.clip(self.cursor, 1, self.screen_size - 2)
+        self.last_hand = np.array(hand, dtype = np.float64)
+        self.last_time = timestamp
+        return self.cursor
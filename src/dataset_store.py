@@ -0,0 +1,164 @@
+import csv
+import json
+import os
+import numpy as np
+from features import NUM_FEATURES
+from utils import resource_path
+
+# Recorded samples stored as float32 .npy shards, one or more per pose, plus an index.json that
+# maps each pose to its shards. Loading is a memory-map instead of parsing text, appends only
+# write a new shard and deleting a pose only removes its own files.
+class DatasetStore:
+    INDEX_FILE = "index.json"
+    # Pending samples are written out as a shard once this many have been recorded
+    FLUSH_SIZE = 256
+
+    def __init__(self, directory = resource_path("data/dataset"), csv_file = resource_path("data/gestures.csv"), sample_shape = (NUM_FEATURES,)):
+        self.directory = directory
+        self.csv_file = csv_file
+        self.sample_shape = tuple(sample_shape)
+        self.pending = {}
+        self.load_index()
+
+    def load_index(self):
+        self.pending = {}
+        index_path = os.path.join(self.directory, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r") as file:
+                self.index = json.load(file)
+            return
+
+        self.index = {"next_shard": 0, "poses": {}}
+        # One-time migration from the old CSV dataset
+        if self.csv_file and os.path.exists(self.csv_file):
+            self.import_csv(self.csv_file)
+
+    def save_index(self):
+        os.makedirs(self.directory, exist_ok = True)
+        index_path = os.path.join(self.directory, self.INDEX_FILE)
+        with open(index_path + ".tmp", "w") as file:
+            json.dump(self.index, file)
+        os.replace(index_path + ".tmp", index_path)
+
+    def get_poses(self):
+        poses = list(self.index["poses"])
+        return poses + [pose for pose in self.pending if pose not in self.index["poses"]]
+
+    def count(self, pose):
+        stored = sum(shard["count"] for shard in self.index["poses"].get(pose, []))
+        return stored + len(self.pending.get(pose, []))
+
+    def append(self, pose, sample):
+        self.pending.setdefault(pose, []).append(np.asarray(sample, dtype = np.float32).reshape(self.sample_shape))
+        if len(self.pending[pose]) >= self.FLUSH_SIZE:
+            self.flush()
+
+    def append_many(self, pose, samples):
+        samples = np.asarray(samples, dtype = np.float32).reshape((-1,) + self.sample_shape)
+        if len(samples):
+            self.write_shard(pose, samples)
+            self.save_index()
+
+    def flush(self):
+        if not self.pending:
+            return
+        for pose, samples in self.pending.items():
+            self.write_shard(pose, np.stack(samples))
+        self.pending = {}
+        self.save_index()
+
+    def write_shard(self, pose, samples):
+        os.makedirs(self.directory, exist_ok = True)
+        file_name = f"shard_{self.index['next_shard']:06d}.npy"
+        self.index["next_shard"] += 1
+        shard_path = os.path.join(self.directory, file_name)
+        with open(shard_path + ".tmp", "wb") as file:
+            np.save(file, samples)
+        os.replace(shard_path + ".tmp", shard_path)
+        self.index["poses"].setdefault(pose, []).append({"file": file_name, "count": len(samples)})
+
+    def delete_pose(self, pose):
+        self.pending.pop(pose, None)
+        shards = self.index["poses"].pop(pose, [])
+        self.save_index()
+        for shard in shards:
+            try:
+                os.remove(os.path.join(self.directory, shard["file"]))
+            except FileNotFoundError:
+                pass
+
+    # Replaces all samples of a pose with the given array
+    def replace_pose(self, pose, samples):
+        old_shards = self.index["poses"].get(pose, [])
+        self.index["poses"][pose] = []
+        self.pending.pop(pose, None)
+        samples = np.asarray(samples, dtype = np.float32).reshape((-1,) + self.sample_shape)
+        if len(samples):
+            self.write_shard(pose, samples)
+        self.save_index()
+        for shard in old_shards:
+            try:
+                os.remove(os.path.join(self.directory, shard["file"]))
+            except FileNotFoundError:
+                pass
+
+    # Merges the shards of a pose into one so loading stays a single read per pose
+    def compact(self, pose):
+        if len(self.index["poses"].get(pose, [])) > 1:
+            self.replace_pose(pose, self.load_pose(pose))
+
+    def load_pose(self, pose):
+        arrays = [np.load(os.path.join(self.directory, shard["file"]), mmap_mode = "r") for shard in self.index["poses"].get(pose, [])]
+        arrays += [np.stack(self.pending[pose])] if pose in self.pending else []
+        if not arrays:
+            return np.empty((0,) + self.sample_shape, dtype = np.float32)
+        return np.concatenate(arrays)
+
+    # Returns (samples, label indices, {pose: label index}) with labels in pose order
+    def load_arrays(self, label_order = None):
+        poses = self.get_poses()
+        if label_order is not None:
+            poses = [pose for pose in label_order if pose in poses] + [pose for pose in poses if pose not in label_order]
+        label_dict = {}
+        samples = []
+        labels = []
+        for pose in poses:
+            pose_samples = self.load_pose(pose)
+            if not len(pose_samples):
+                continue
+            label_dict[pose] = len(label_dict)
+            samples.append(pose_samples)
+            labels.append(np.full(len(pose_samples), label_dict[pose], dtype = np.int32))
+        if not samples:
+            return np.empty((0,) + self.sample_shape, dtype = np.float32), np.empty(0, dtype = np.int32), label_dict
+        return np.concatenate(samples), np.concatenate(labels), label_dict
+
+    def import_csv(self, path):
+        rows = {}
+        with open(path, newline = "") as file:
+            for row in csv.reader(file):
+                if row:
+                    rows.setdefault(row[0], []).append(row[1:])
+        for pose, samples in rows.items():
+            self.write_shard(pose, np.array(samples, dtype = np.float32).reshape((-1,) + self.sample_shape))
+        self.save_index()
+
+    def export_csv(self, path):
+        with open(path, "w", newline = "") as file:
+            writer = csv.writer(file)
+            for pose in self.get_poses():
+                for sample in self.load_pose(pose):
+                    writer.writerow([pose] + sample.reshape(-1).tolist())
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description = "Import or export the gesture dataset as CSV")
+    parser.add_argument("command", choices = ["import", "export"])
+    parser.add_argument("path", nargs = "?", default = resource_path("data/gestures.csv"))
+    args = parser.parse_args()
+
+    store = DatasetStore(csv_file = None)
+    if args.command == "import":
+        store.import_csv(args.path)
+    else:
+        store.export_csv(args.path)
@@ -0,0 +1,139 @@
+import numpy as np
+from features import NUM_LANDMARKS, extract_features_batch
+
+# Maintenance of the recorded pose samples. Recording stores a frame every time Enter is pressed,
+# so the dataset collects near-identical frames, the odd mislabeled frame and poses with far more
+# samples than others. Everything works on (N, 42) feature arrays and label indices so it can run
+# on the dataset store before training as well as on a training split inside the trainer.
+
+DEFAULT_DATASET_CONFIG = {
+    # Samples closer than this (Euclidean, in normalized feature units) count as duplicates
+    "duplicate_radius": 0.03,
+    # Robust z-score of the distance to the pose's median above which a sample is an outlier
+    "outlier_threshold": 4.0,
+    # Share of a sample's nearest neighbours that have to belong to other poses to call it mislabeled
+    "mislabel_share": 1.0,
+    # How training evens out pose counts: "none", "subsample" or "augment"
+    "balance": "none"
+}
+BALANCE_STRATEGIES = ["none", "subsample", "augment"]
+NEIGHBOURS = 5
+
+# Augmentation: rotation around the wrist in degrees and per coordinate noise before renormalizing
+AUGMENT_ROTATION = 10.0
+AUGMENT_NOISE = 0.01
+
+# Boolean mask of the samples to keep so that no two kept samples are closer than radius,
+# earlier samples win
+def find_duplicates(samples, radius):
+    # SciPy ships with scikit-learn, imported here so loading the GUI doesn't pay for it
+    from scipy.spatial import cKDTree
+    keep = np.ones(len(samples), dtype = bool)
+    if len(samples) < 2:
+        return keep
+    pairs = cKDTree(samples).query_pairs(radius, output_type = "ndarray")
+    if not len(pairs):
+        return keep
+
+    # Pairs come as (i, j) with i < j. Grouped by i, a kept sample removes all its later neighbours.
+    pairs = pairs[np.argsort(pairs[:, 0], kind = "stable")]
+    firsts, starts = np.unique(pairs[:, 0], return_index = True)
+    for first, neighbours in zip(firsts, np.split(pairs[:, 1], starts[1:])):
+        if keep[first]:
+            keep[neighbours] = False
+    return keep
+
+# Robust z-score of every sample's distance to the median of its own pose
+def outlier_scores(samples, labels):
+    scores = np.zeros(len(samples), dtype = np.float32)
+    for label in np.unique(labels):
+        members = labels == label
+        distances = np.linalg.norm(samples[members] - np.median(samples[members], axis = 0), axis = 1)
+        median = np.median(distances)
+        # 1.4826 turns the median absolute deviation into a standard deviation for normal data
+        spread = 1.4826 * np.median(np.abs(distances - median))
+        scores[members] = (distances - median) / spread if spread > 0 else 0
+    return scores
+
+# Share of every sample's nearest neighbours that are labeled with a different pose
+def mislabel_scores(samples, labels, neighbours = NEIGHBOURS):
+    from scipy.spatial import cKDTree
+    if len(samples) <= neighbours:
+        return np.zeros(len(samples), dtype = np.float32)
+    _, indices = cKDTree(samples).query(samples, k = neighbours + 1)
+    # The first neighbour is the sample itself
+    return (labels[indices[:, 1:]] != labels[:, np.newaxis]).mean(axis = 1).astype(np.float32)
+
+# Boolean mask of the samples that are far from their pose or surrounded by other poses
+def find_outliers(samples, labels, config = None):
+    config = dict(DEFAULT_DATASET_CONFIG, **(config or {}))
+    outliers = outlier_scores(samples, labels) > config["outlier_threshold"]
+    return outliers | (mislabel_scores(samples, labels) >= config["mislabel_share"])
+
+# Random rotations around the wrist plus noise, renormalized the way live features are
+def augment(samples, count, rng):
+    picked = samples[rng.integers(0, len(samples), size = count)].reshape(count, NUM_LANDMARKS, 2)
+    angles = np.radians(rng.uniform(-AUGMENT_ROTATION, AUGMENT_ROTATION, size = count))
+    cos, sin = np.cos(angles)[:, np.newaxis], np.sin(angles)[:, np.newaxis]
+    rotated = np.stack([picked[..., 0] * cos - picked[..., 1] * sin, picked[..., 0] * sin + picked[..., 1] * cos], axis = -1)
+    rotated += rng.normal(0, AUGMENT_NOISE, size = rotated.shape)
+    return extract_features_batch(rotated)
+
+# Evens out pose counts: "subsample" cuts every pose down to the smallest one, "augment" fills every
+# pose up to the largest one with augmented copies. Returns the new (samples, labels).
+def balance(samples, labels, strategy = "none", seed = 42):
+    if strategy not in BALANCE_STRATEGIES:
+        raise ValueError("Unknown balance strategy: " + str(strategy))
+    if strategy == "none" or not len(samples):
+        return samples, labels
+
+    rng = np.random.default_rng(seed)
+    present = np.unique(labels)
+    counts = np.bincount(labels)[present]
+    balanced_samples = []
+    balanced_labels = []
+    for label in present:
+        members = np.asarray(samples[labels == label], dtype = np.float32)
+        if strategy == "subsample":
+            members = members[np.sort(rng.choice(len(members), counts.min(), replace = False))]
+        elif len(members) < counts.max():
+            members = np.concatenate([members, augment(members, counts.max() - len(members), rng)])
+        balanced_samples.append(members)
+        balanced_labels.append(np.full(len(members), label, dtype = np.int32))
+    return np.concatenate(balanced_samples), np.concatenate(balanced_labels)
+
+# Per pose sample counts and how many samples cleaning would remove. Duplicates are looked for
+# within each pose, outliers among the samples that aren't duplicates.
+def summarize(samples, labels, label_names, config = None):
+    config = dict(DEFAULT_DATASET_CONFIG, **(config or {}))
+    keep = np.zeros(len(samples), dtype = bool)
+    for label in range(len(label_names)):
+        members = np.nonzero(labels == label)[0]
+        keep[members] = find_duplicates(samples[members], config["duplicate_radius"])
+    outliers = np.zeros(len(samples), dtype = bool)
+    outliers[keep] = find_outliers(samples[keep], labels[keep], config)
+
+    poses = {}
+    for label, name in enumerate(label_names):
+        members = labels == label
+        poses[name] = {
+            "samples": int(members.sum()),
+            "duplicates": int((members & ~keep).sum()),
+            "outliers": int((members & outliers).sum())
+        }
+    counts = [pose["samples"] for pose in poses.values()]
+    return {
+        "poses": poses,
+        "samples": len(samples),
+        "duplicates": int((~keep).sum()),
+        "outliers": int(outliers.sum()),
+        # Largest pose count over the smallest one, 1 is perfectly balanced
+        "imbalance": max(counts) / max(min(counts), 1) if counts else 1.0,
+        "keep": keep & ~outliers
+    }
+
+def print_summary(summary):
+    print(f"{'pose':<20}{'samples':>9}{'duplicates':>12}{'outliers':>10}")
+    for name, pose in summary["poses"].items():
+        print(f"{name:<20}{pose['samples']:>9}{pose['duplicates']:>12}{pose['outliers']:>10}")
+    print(f"{summary['samples']} samples, {summary['duplicates']} duplicates, {summary['outliers']} outliers, imbalance {summary['imbalance']:.1f}x")
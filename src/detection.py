@@ -0,0 +1,20 @@
+# Result objects published by the GestureController once per processed camera frame.
+# They are never modified after being published so subscribers on other threads can keep them.
+
+class HandResult:
+    def __init__(self, landmarks, handedness, pose_name = "Unknown", confidence = None, entered = False, motion = None):
+        self.landmarks = landmarks
+        self.handedness = handedness
+        self.pose_name = pose_name
+        self.confidence = confidence
+        # True on the frame the pose became active
+        self.entered = entered
+        # Name of the motion gesture that completed on this frame, if any
+        self.motion = motion
+
+class DetectionResult:
+    def __init__(self, seq, timestamp, hands):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.hands = hands
+
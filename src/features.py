@@ -0,0 +1,76 @@
+import numpy as np
+
+NUM_LANDMARKS = 21
+NUM_FEATURES = NUM_LANDMARKS * 2
+
+# Bump whenever the feature layout changes so models trained on old features can be detected
+FEATURE_SCHEMA_VERSION = 1
+
+# Builds the classifier input from MediaPipe hand landmarks. Live inference and recording both go
+# through here so the model is always trained on the same features it later sees.
+
+def new_feature_buffer(rows = 1):
+    return np.zeros((rows, NUM_FEATURES), dtype = np.float32)
+
+# Fills out (shape (1, 42) or (42,)) in place from a landmark protobuf and returns it
+def extract_features(hand_landmarks, handedness, out = None):
+    if out is None:
+        out = new_feature_buffer()
+    flat = out.reshape(NUM_FEATURES)
+    flat[:] = np.fromiter(
+        (value for landmark in hand_landmarks.landmark for value in (landmark.x, landmark.y)),
+        dtype = np.float32,
+        count = NUM_FEATURES
+    )
+    normalize_points(flat.reshape(NUM_LANDMARKS, 2), handedness == "Right")
+    return out
+
+# Normalizes a (21, 2) array of landmark coordinates in place
+def normalize_points(points, mirror):
+    # Make coordinates relative to the wrist
+    points -= points[0]
+
+    # Mirror right hands so both hands produce the same features
+    if mirror:
+        points[:, 0] *= -1
+
+    # Scale into the -1 to 1 range based on the max absolute value
+    max_val = np.abs(points).max()
+    if max_val != 0:
+        points /= max_val
+
+# Batched form for offline use, points is (N, 21, 2) and mirror is an optional (N,) boolean array
+def extract_features_batch(points, mirror = None):
+    points = np.array(points, dtype = np.float32)
+    points -= points[:, :1]
+    if mirror is not None:
+        points[np.asarray(mirror, dtype = bool), :, 0] *= -1
+
+    features = points.reshape(len(points), NUM_FEATURES)
+    max_vals = np.abs(features).max(axis = 1, keepdims = True)
+    max_vals[max_vals == 0] = 1
+    features /= max_vals
+    return features
+
+# Per frame input of the motion model: the pose features plus how far the wrist moved since the
+# previous frame, measured in palm lengths so a swipe looks the same at any distance from the camera
+NUM_MOTION_FEATURES = NUM_FEATURES + 2
+# Brings per frame wrist movement (a fast swipe is ~0.1 palm lengths) into the range of the pose features
+MOTION_SCALE = 10.0
+
+# Fills out (shape (44,)) from the frame's pose features and landmarks, returns the wrist position
+# and palm length to pass back in as previous with the next frame
+def extract_motion_features(features, hand_landmarks, previous = None, out = None):
+    if out is None:
+        out = np.zeros(NUM_MOTION_FEATURES, dtype = np.float32)
+    out[:NUM_FEATURES] = features.reshape(NUM_FEATURES)
+    wrist = hand_landmarks.landmark[0]
+    middle = hand_landmarks.landmark[9]
+    palm_length = max(np.hypot(middle.x - wrist.x, middle.y - wrist.y), 1e-6)
+    if previous is None:
+        out[NUM_FEATURES:] = 0
+    else:
+        previous_x, previous_y, previous_length = previous
+        out[NUM_FEATURES] = (wrist.x - previous_x) / previous_length * MOTION_SCALE
+        out[NUM_FEATURES + 1] = (wrist.y - previous_y) / previous_length * MOTION_SCALE
+    return out, (wrist.x, wrist.y, palm_length)
@@ -1,181 +1,521 @@
 import cv2
-import mediapipe as mp
 import numpy as np
-import pyautogui
 import threading
-import tensorflow.lite as tflite
 import time
 import json
 from pose_action_manager import PoseActionManager
-from action_controller import ActionController
-from utils import resource_path
+from action_registry import POINTER_ACTIONS
+from continuous_gestures import ContinuousGesture
+from cursor_motion import CursorMapper, create_filter
+from detection import DetectionResult, HandResult
+from features import extract_features, new_feature_buffer
+from metrics import RateMeter, StageTimings
+from model_bundle import ModelBundle
+from pose_state import PoseStateMachine, get_pose_config
+from sequence_model import MotionDetector, MotionWindow, SequenceModel
+from utils import import_mediapipe
 
+mp = import_mediapipe()
 
 class CursorMovementThread(threading.Thread):
-    def __init__(self):
+    DEFAULT_CONFIG = {
+        "filter": "one_euro",
+        "one_euro": {"min_cutoff": 1.0, "beta": 0.01, "d_cutoff": 1.0},
+        "kalman": {"process_noise": 2e6, "measurement_noise": 9.0},
+        # Seconds to extrapolate past the present to make up for output latency
+        "lead": 0.02,
+        # Never extrapolate further than this past the newest camera frame
+        "max_prediction": 0.1,
+        # Part of the camera image (x0, y0, x1, y1) that maps onto the whole screen
+        "active_area": [0.1, 0.1, 0.9, 0.9],
+        "acceleration": {"factor": 0.0, "exponent": 1.0, "reference_speed": 1000.0, "max_gain": 3.0},
+        # Cursor updates per second between camera frames
+        "output_rate": 120
+    }
+
+    def __init__(self, action_controller, config = None):
         super().__init__()
         self.daemon = True
-        self.current_x, self.current_y = pyautogui.position()
-        self.target_x, self.target_y = self.current_x, self.current_y
+        self.config = dict(self.DEFAULT_CONFIG, **(config or {}))
+        self.action_controller = action_controller
+        screen_width, screen_height = action_controller.get_screen_size()
+        self.mapper = CursorMapper(screen_width, screen_height, self.config["active_area"], self.config["acceleration"])
+        self.filter = create_filter(self.config)
+        self.filter_lock = threading.Lock()
+        self.current_x, self.current_y = action_controller.get_cursor_position()
         self.running = True
         self.active = False
-        self.smoothing = 0.2
+        self.timings = StageTimings(["move"])
+        self.active_event = threading.Event()
+        self.measurement_event = threading.Event()
 
     def run(self):
+        interval = 1 / self.config["output_rate"]
         while self.running:
-            if self.active:
-                dx = self.target_x - self.current_x
-                dy = self.target_y - self.current_y
-                self.current_x += dx * self.smoothing
-                self.current_y += dy * self.smoothing
-                pyautogui.moveTo(self.current_x, self.current_y, _pause = False)
-            time.sleep(0.01)
+            # Sleep until activated instead of polling while the cursor isn't being controlled
+            if not self.active:
+                self.active_event.wait()
+                continue
+
+            # Predict where the hand is now from the camera timestamped measurements
+            now = time.monotonic()
+            with self.filter_lock:
+                if self.filter.timestamp is None:
+                    position = None
+                else:
+                    target_time = min(now + self.config["lead"], self.filter.timestamp + self.config["max_prediction"])
+                    position = self.filter.predict(target_time)
+                    position = self.mapper.apply(position, target_time)
+
+            if position is not None and (abs(position[0] - self.current_x) >= 0.5 or abs(position[1] - self.current_y) >= 0.5):
+                self.current_x, self.current_y = position
+                start = time.perf_counter()
+                # A failed move must not end the thread, cursor control would be gone until restart
+                try:
+                    self.action_controller.move_cursor(self.current_x, self.current_y)
+                except Exception as e:
+                    print("Cursor move failed:", str(e))
+                self.timings.record("move", time.perf_counter() - start)
+
+            # Wake up early when a new camera measurement arrives
+            self.measurement_event.wait(interval)
+            self.measurement_event.clear()
 
-    def update_target(self, x, y):
-        self.target_x, self.target_y = x, y
+    # x and y are normalized camera coordinates, timestamp is the camera frame's capture time
+    def update_target(self, x, y, timestamp):
+        with self.filter_lock:
+            self.filter.update(self.mapper.to_screen(x, y), timestamp)
+        self.measurement_event.set()
 
     def activate(self):
+        if not self.active:
+            with self.filter_lock:
+                self.filter.reset()
+                self.mapper.reset()
         self.active = True
+        self.active_event.set()
 
     def deactivate(self):
         self.active = False
+        self.active_event.clear()
 
     def stop(self):
         self.running = False
+        self.active_event.set()
+        self.measurement_event.set()
+
+# Action state that is tracked separately for each hand
+class HandState:
+    def __init__(self, pose_filter_config = None, motion_config = None):
+        self.mouse_mode = False
+        self.mouse_held = None
+        # Continuous gesture in progress, tracks the hand's movement while its pose is held
+        self.continuous = None
+        self.pose_filter = PoseStateMachine(pose_filter_config)
+        # Recent motion feature frames and the streaming motion recognizer fed from them
+        self.motion_window = MotionWindow()
+        self.motion_detector = MotionDetector(motion_config)
 
 class GestureController:
-    def __init__(self, camera_manager):
+    MAX_HANDS = 2
+    STAGES = ["capture", "color", "detection", "features", "inference", "motion", "dispatch", "total"]
+    DEFAULT_CONFIG = {
+        # Seconds without a hand before dropping to the idle detection rate
+        "idle_after": 3.0,
+        "idle_fps": 4.0,
+        # Idle frames are downscaled by this factor before detection
+        "idle_scale": 0.5,
+        # Only detect inside the area around the previous frame's hands
+        "roi": False,
+        # Padding around the hands' bounding box, as a fraction of its size
+        "roi_margin": 0.6,
+        # Seconds between searches of the full frame while fewer than MAX_HANDS hands are tracked,
+        # so a hand entering outside the region is still found
+        "roi_full_frame_interval": 0.5,
+        # Longest side in pixels of the image passed to detection, 0 keeps the full resolution
+        "detection_max_size": 0,
+        # Smoothing, thresholds, dwell times and cooldowns of the pose state machine
+        "pose_filter": {},
+        # Motion filter, prediction and mapping settings of the cursor
+        "cursor": {},
+        # Firing threshold and refractory time of motion gestures
+        "motion": {},
+        # Classifier runtime ("auto", "numpy" or "tflite"), exported model variant ("float32",
+        # "dynamic", "float16" or "int8") and TFLite interpreter threads (null for TFLite's default).
+        # "auto" runs float32 on NumPy and the other variants on TFLite.
+        "runtime": "auto",
+        "precision": "float32",
+        "threads": None
+    }
+
+    def __init__(self, camera_manager, pose_action_manager = None, action_controller = None, hands = None, config = None):
+        self.config = dict(self.DEFAULT_CONFIG, **(config or {}))
         self.running = False
+        self.stop_event = threading.Event()
         self.paused = False
         self.camera_manager = camera_manager
         self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            max_num_hands = 1,
+        # Anything with a MediaPipe style process(rgb) can stand in for the hand detector
+        self.hands = hands or self.mp_hands.Hands(
+            max_num_hands = self.MAX_HANDS,
             model_complexity = 0,
             min_detection_confidence = 0.5,
             min_tracking_confidence = 0.5
         )
-        self.interpreter = tflite.Interpreter(model_path = resource_path("model/gesture_model.tflite"))
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
-        self.GESTURE_LABELS = self.load_gesture_labels()
-        self.screen_width, self.screen_height = pyautogui.size()
-        self.movement_thread = CursorMovementThread()
-        self.mouse_mode = False
-        self.mouse_held = None
-        self.pose_action_manager = PoseActionManager()
-        self.action_controller = ActionController()
-        self.prev_pose_name = ""
-
-    def process_landmarks(self, hand_landmarks, handedness):
-        landmarks = []
-
-        # Extract x and y coordinates of each landmark normalized to wrist position
-        for landmark in hand_landmarks.landmark:
-            xCoordinate = landmark.x - hand_landmarks.landmark[0].x 
-            yCoordinate = landmark.y - hand_landmarks.landmark[0].y
-
-            if handedness == 'Left':
-                landmarks.append([xCoordinate, yCoordinate])
-            elif handedness == 'Right':
-                landmarks.append([-xCoordinate, yCoordinate])
-
-        # Flatten landmarks into 1D list
-        flattened_landmarks = np.array(landmarks).flatten().tolist()
-
-        # Normalize landmarks into -1 to 1 range based on max absolute value
-        max_val = max([abs(num) for num in flattened_landmarks]) # Get the max absolute value
-        if max_val == 0:
-            max_val = 1
-        processed_landmarks = (np.array(flattened_landmarks) / max_val).tolist() # Divide every number by the max absolute value
-        
-        return np.array([processed_landmarks], dtype = np.float32)
-    
-    def load_gesture_labels(self):
-        try:
-            with open(resource_path("data/poses.txt"), "r") as file:
-                return [line.strip() for line in file if line.strip()]
-        except FileNotFoundError:
-            # print("Warning: poses.txt not found. Using empty label list.")
-            return []
+        self.model = ModelBundle.load(runtime = self.config["runtime"], precision = self.config["precision"], threads = self.config["threads"])
+        self.sequence_model = SequenceModel.load()
+        self.model_lock = threading.Lock()
+        # Reloads are numbered when requested, the model of the latest request that finished is in use
+        self.reload_requests = 0
+        self.loaded_request = 0
+        self.input_tensor = new_feature_buffer(self.MAX_HANDS)
+        if action_controller is None:
+            # Imported here so headless tools can use the controller without a display
+            from action_controller import ActionController
+            action_controller = ActionController()
+        self.action_controller = action_controller
+        self.movement_thread = CursorMovementThread(self.action_controller, self.config["cursor"])
+        self.hand_states = {handedness: HandState(self.config["pose_filter"], self.config["motion"]) for handedness in ["Left", "Right"]}
+        self.last_action_times = {}
+        self.cursor_owner = None
+        self.pose_action_manager = pose_action_manager or PoseActionManager()
+        self.timings = StageTimings(self.STAGES)
+        self.processed_rate = RateMeter()
+        self.dropped_frames = 0
+        self.last_seq = 0
+        self.last_hand_time = time.monotonic()
+        self.idle = False
+        self.roi = None
+        # Separate detector for the full frame searches, created on first use
+        self.search_hands = None
+        self.last_full_frame = 0.0
+        self.latest_result = None
+        self.subscribers = []
+        self.subscriber_lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self.subscriber_lock:
+            self.subscribers = self.subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        with self.subscriber_lock:
+            self.subscribers = [subscriber for subscriber in self.subscribers if subscriber != callback]
+
+    def get_latest_result(self):
+        return self.latest_result
+
+    def publish(self, result):
+        self.latest_result = result
+        for callback in self.subscribers:
+            callback(result)
+
+    # Runs hand detection and pose classification once for a camera frame
+    def detect(self, seq, timestamp, frame):
+        start = time.perf_counter()
+        region = self.roi if self.config["roi"] else None
+        image = self.prepare_image(frame, region)
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        rgb.flags.writeable = False
+        color_done = time.perf_counter()
+        results = self.hands.process(rgb)
+        if region is not None and results.multi_hand_landmarks:
+            self.map_from_region(results.multi_hand_landmarks, region)
+        if region is None:
+            self.last_full_frame = timestamp
+        elif len(results.multi_hand_landmarks or []) < self.MAX_HANDS and timestamp - self.last_full_frame >= self.config["roi_full_frame_interval"]:
+            self.last_full_frame = timestamp
+            results = self.search_full_frame(frame, results)
+        if self.config["roi"]:
+            self.update_roi(results.multi_hand_landmarks)
+        detection_done = time.perf_counter()
+        self.timings.record("color", color_done - start)
+        self.timings.record("detection", detection_done - color_done)
+
+        # Hold on to one bundle for the whole frame so a reload can't mix models and labels
+        model = self.model
+        sequence_model = self.sequence_model
+        hands = []
+        seen = set()
+        if results.multi_hand_landmarks:
+            detected = list(zip(results.multi_hand_landmarks, results.multi_handedness))[:self.MAX_HANDS]
+            for row, (hand_landmarks, hand_info) in enumerate(detected):
+                extract_features(hand_landmarks, hand_info.classification[0].label, self.input_tensor[row])
+            features_done = time.perf_counter()
+
+            # Classify every hand with a single interpreter call
+            predictions = model.classify(self.input_tensor[:len(detected)])
+            self.timings.record("features", features_done - detection_done)
+            self.timings.record("inference", time.perf_counter() - features_done)
+
+            motion_time = 0.0
+            for row, ((hand_landmarks, hand_info), hand_predictions) in enumerate(zip(detected, predictions)):
+                handedness = hand_info.classification[0].label
+                motion = None
+                # Poses come from each hand's state machine instead of a single frame's prediction
+                if handedness in seen:
+                    pose_name, confidence, entered = "Unknown", float(np.max(hand_predictions)), False
+                else:
+                    state = self.hand_states[handedness]
+                    pose_name, confidence, entered = state.pose_filter.update(hand_predictions, model.labels, timestamp, model.thresholds)
+
+                    # The motion model advances by one time step per frame
+                    motion_start = time.perf_counter()
+                    frame = state.motion_window.push(self.input_tensor[row], hand_landmarks)
+                    if sequence_model is not None:
+                        motion = state.motion_detector.update(sequence_model, frame, timestamp)
+                    motion_time += time.perf_counter() - motion_start
+                seen.add(handedness)
+                hands.append(HandResult(hand_landmarks, handedness, pose_name, confidence, entered, motion))
+            self.timings.record("motion", motion_time)
+
+        # Hands that left the frame start from scratch when they return
+        for handedness, state in self.hand_states.items():
+            if handedness not in seen:
+                state.pose_filter.reset()
+                state.motion_window.reset()
+                state.motion_detector.reset()
+
+        return DetectionResult(seq, timestamp, hands)
+
+    # Crops the frame to the normalized (x0, y0, x1, y1) region and downscales it for detection
+    def prepare_image(self, frame, region):
+        if region is not None:
+            height, width = frame.shape[:2]
+            x0, y0, x1, y1 = region
+            frame = frame[int(y0 * height):int(y1 * height), int(x0 * width):int(x1 * width)]
+
+        max_size = self.config["detection_max_size"]
+        if max_size and max(frame.shape[:2]) > max_size:
+            scale = max_size / max(frame.shape[:2])
+            frame = cv2.resize(frame, None, fx = scale, fy = scale, interpolation = cv2.INTER_AREA)
+        return frame
+
+    # Converts landmarks detected inside a region back to full frame coordinates
+    def map_from_region(self, multi_hand_landmarks, region):
+        x0, y0, x1, y1 = region
+        for hand_landmarks in multi_hand_landmarks:
+            for landmark in hand_landmarks.landmark:
+                landmark.x = x0 + landmark.x * (x1 - x0)
+                landmark.y = y0 + landmark.y * (y1 - y0)
+
+    # The crop hides hands outside it. The full frame is searched by a second detector in static image
+    # mode, feeding it to the tracking detector would move its state out of the crop's coordinates
+    # and force a palm detection on this frame and the next. Returns the search's results if it
+    # found more hands than are tracked, update_roi then widens the region to include them.
+    def search_full_frame(self, frame, results):
+        if self.search_hands is None:
+            self.search_hands = self.mp_hands.Hands(
+                static_image_mode = True,
+                max_num_hands = self.MAX_HANDS,
+                model_complexity = 0,
+                min_detection_confidence = 0.5
+            )
+        rgb = cv2.cvtColor(self.prepare_image(frame, None), cv2.COLOR_BGR2RGB)
+        rgb.flags.writeable = False
+        found = self.search_hands.process(rgb)
+        if len(found.multi_hand_landmarks or []) > len(results.multi_hand_landmarks or []):
+            return found
+        return results
+
+    def update_roi(self, multi_hand_landmarks):
+        # Fall back to the full frame as soon as the hand is lost
+        if not multi_hand_landmarks:
+            self.roi = None
+            return
+
+        xs = [landmark.x for hand_landmarks in multi_hand_landmarks for landmark in hand_landmarks.landmark]
+        ys = [landmark.y for hand_landmarks in multi_hand_landmarks for landmark in hand_landmarks.landmark]
+        left, top, right, bottom = min(xs), min(ys), max(xs), max(ys)
+
+        # Keep the region while the hands stay well inside it. A stable crop keeps MediaPipe's own
+        # frame to frame tracking valid, moving it every frame would force a new palm detection.
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            inner_x = (x1 - x0) * 0.1
+            inner_y = (y1 - y0) * 0.1
+            if left > x0 + inner_x and right < x1 - inner_x and top > y0 + inner_y and bottom < y1 - inner_y:
+                return
+
+        # Pad the box so fast movements stay inside the region until the next frame
+        size = max(right - left, bottom - top) * (1 + 2 * self.config["roi_margin"])
+        size = max(size, 0.25)
+        center_x = (left + right) / 2
+        center_y = (top + bottom) / 2
+        self.roi = (
+            max(0.0, center_x - size / 2),
+            max(0.0, center_y - size / 2),
+            min(1.0, center_x + size / 2),
+            min(1.0, center_y + size / 2)
+        )
 
     def run(self):
         self.running = True
+        self.stop_event.clear()
         self.movement_thread.start()
+        last_start = 0
         while self.running:
-            if self.paused:
-                time.sleep(.05)
+            # With no hand around only look for one a few times per second
+            self.idle = time.monotonic() - self.last_hand_time > self.config["idle_after"]
+            if self.idle:
+                delay = last_start + 1 / self.config["idle_fps"] - time.monotonic()
+                if delay > 0 and self.stop_event.wait(delay):
+                    break
+
+            # Block until the camera delivers a frame that hasn't been processed yet
+            frame_data = self.camera_manager.wait_for_frame(self.last_seq, timeout = 0.1)
+            if frame_data is None:
                 continue
+            last_start = time.monotonic()
+            seq, timestamp, frame = frame_data
+            if self.last_seq and seq > self.last_seq + 1 and not self.idle:
+                # The camera delivered frames faster than they could be processed
+                self.dropped_frames += seq - self.last_seq - 1
+            self.last_seq = seq
+            start = time.perf_counter()
+            self.timings.record("capture", time.monotonic() - timestamp)
+
+            if self.idle and self.config["idle_scale"] < 1:
+                # Landmarks are normalized so detecting on a smaller frame gives the same coordinates
+                frame = cv2.resize(frame, None, fx = self.config["idle_scale"], fy = self.config["idle_scale"], interpolation = cv2.INTER_AREA)
 
-            frame = self.camera_manager.get_frame()
-            if frame is None:
+            # Detection keeps running while paused so the preview and recorder still get results
+            result = self.detect(self.last_seq, timestamp, frame)
+            if result.hands:
+                self.last_hand_time = time.monotonic()
+            self.publish(result)
+            dispatch_start = time.perf_counter()
+            if not self.paused:
+                self.handle_result(result)
+            end = time.perf_counter()
+            self.timings.record("dispatch", end - dispatch_start)
+            self.timings.record("total", end - start)
+            self.processed_rate.tick()
+
+    def handle_result(self, result):
+        present = set()
+        for hand in result.hands:
+            # MediaPipe can label both hands the same, only the first one drives actions then
+            if hand.handedness in present:
                 continue
+            present.add(hand.handedness)
+            self.handle_hand(hand, self.hand_states[hand.handedness], result.timestamp)
 
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            rgb.flags.writeable = False
-            results = self.hands.process(rgb)
-            rgb.flags.writeable = True
+        for handedness, state in self.hand_states.items():
+            if handedness not in present:
+                state.continuous = None
 
-            pose_name = "No Hand"
-            confidence = None
+        # Let the other hand take over the cursor once its owner leaves the frame
+        if self.cursor_owner is not None and self.cursor_owner not in present:
+            self.release_cursor(self.hand_states[self.cursor_owner])
 
-            if results.multi_hand_landmarks:
-                hand_landmarks = results.multi_hand_landmarks[0]
-                handedness = results.multi_handedness[0].classification[0].label
-                input_tensor = self.process_landmarks(hand_landmarks, handedness)
-                self.interpreter.set_tensor(self.input_details[0]['index'], input_tensor)
-                self.interpreter.invoke()
-                predictions = self.interpreter.get_tensor(self.output_details[0]['index'])[0]
+    # Drops cursor ownership, releasing the owner's held button so the next owner doesn't drag with it
+    def release_cursor(self, state):
+        if state.mouse_held:
+            self.action_controller.mouse_up(state.mouse_held)
+            state.mouse_held = None
+        state.mouse_mode = False
+        self.movement_thread.deactivate()
+        self.cursor_owner = None
 
-                best_idx = np.argmax(predictions)
-                confidence = predictions[best_idx]
+    def handle_hand(self, hand, state, timestamp):
+        pose_name = hand.pose_name
+        hand_landmarks = hand.landmarks
+        # Motions are mapped like poses but only trigger discrete actions
+        if hand.motion is not None:
+            motion_action = self.pose_action_manager.get_pose_action(hand.motion)
+            if motion_action in self.action_controller.get_actions() and motion_action not in POINTER_ACTIONS:
+                if self.action_controller.get_continuous_action(motion_action) is None and self.cooldown_passed(motion_action, hand.motion, timestamp):
+                    self.action_controller.perform_action(motion_action, timestamp)
 
-                if confidence > 0.90:
-                    pose_name = self.GESTURE_LABELS[best_idx]
-                else:
-                    pose_name = "Unknown"
-                
-                if pose_name != "Unknown":
-                    action = self.pose_action_manager.get_pose_action(pose_name)
-                    if action in ["Mouse Mode", "Left Click", "Right Click"]:
-                        self.mouse_mode = True
-                        self.movement_thread.activate()
-                        cursor_point = hand_landmarks.landmark[self.mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-                        finger_x = (1 - cursor_point.x) * self.screen_width
-                        finger_y = cursor_point.y * self.screen_height
-                        self.movement_thread.update_target(finger_x, finger_y)
-
-                        if action == "Left Click" and self.mouse_held != "left":
-                            pyautogui.mouseDown()
-                            self.mouse_held = "left"
-                        elif action == "Right Click" and self.mouse_held != "right":
-                            pyautogui.mouseDown(button = 'right')
-                            self.mouse_held = "right"
-                        elif action == "Mouse Mode":
-                            # Allow movement, but no clicking
-                            if self.mouse_held == "left":
-                                pyautogui.mouseUp()
-                                self.mouse_held = None
-                            elif self.mouse_held == "right":
-                                pyautogui.mouseUp(button = 'right')
-                                self.mouse_held = None
-
-                    elif action == "Neutral":
-                        self.movement_thread.deactivate()
-                        self.mouse_mode = False
-                        if self.mouse_held:
-                            pyautogui.mouseUp()
-                            pyautogui.mouseUp(button = 'right')
-                            self.mouse_held = None
-                    
-                    elif action != "" and self.prev_pose_name != pose_name:
-                        self.action_controller.perform_action(action)
-                        self.prev_pose_name = pose_name
+        action = self.pose_action_manager.get_pose_action(pose_name) if pose_name != "Unknown" else None
+        continuous_config = self.action_controller.get_continuous_action(action) if action else None
+        if continuous_config is None or (state.continuous is not None and state.continuous.name != action):
+            state.continuous = None
+
+        if pose_name != "Unknown":
+            if action in ["Mouse Mode", "Left Click", "Right Click"]:
+                # Only one hand at a time can steer the cursor
+                if self.cursor_owner is None:
+                    self.cursor_owner = hand.handedness
+                if self.cursor_owner != hand.handedness:
+                    return
+
+                state.mouse_mode = True
+                self.movement_thread.activate()
+                cursor_point = hand_landmarks.landmark[self.mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
+                self.movement_thread.update_target(cursor_point.x, cursor_point.y, timestamp)
+
+                if action == "Left Click" and state.mouse_held != "left":
+                    self.action_controller.mouse_down("left", timestamp)
+                    state.mouse_held = "left"
+                elif action == "Right Click" and state.mouse_held != "right":
+                    self.action_controller.mouse_down('right', timestamp)
+                    state.mouse_held = "right"
+                elif action == "Mouse Mode":
+                    # Allow movement, but no clicking
+                    if state.mouse_held == "left":
+                        self.action_controller.mouse_up()
+                        state.mouse_held = None
+                    elif state.mouse_held == "right":
+                        self.action_controller.mouse_up('right')
+                        state.mouse_held = None
+
+            elif action == "Neutral":
+                if self.cursor_owner == hand.handedness:
+                    self.movement_thread.deactivate()
+                    self.cursor_owner = None
+                state.mouse_mode = False
+                if state.mouse_held:
+                    self.action_controller.mouse_up()
+                    self.action_controller.mouse_up('right')
+                    state.mouse_held = None
+
+            # Continuous actions follow the hand for as long as the pose is held
+            elif continuous_config is not None:
+                if state.continuous is None:
+                    state.continuous = ContinuousGesture(action, continuous_config)
+                steps = state.continuous.update(hand_landmarks, timestamp)
+                if steps:
+                    self.action_controller.perform_continuous(action, steps)
+
+            # Discrete actions fire once when their pose is entered
+            elif action != "" and hand.entered and self.cooldown_passed(action, pose_name, timestamp):
+                self.action_controller.perform_action(action, timestamp)
+
+    def cooldown_passed(self, action, pose_name, timestamp):
+        cooldown = get_pose_config(self.config["pose_filter"], pose_name)["cooldown"]
+        if timestamp - self.last_action_times.get(action, float("-inf")) < cooldown:
+            return False
+        self.last_action_times[action] = timestamp
+        return True
+
+    # Snapshot of the pipeline's counters and timings, percentiles are only computed here
+    def get_metrics(self):
+        metrics = {
+            "time": time.time(),
+            "camera": self.camera_manager.get_metrics(),
+            "recognition": {
+                "fps": self.processed_rate.rate(),
+                "frames": int(self.processed_rate.count),
+                "dropped_frames": self.dropped_frames,
+                "idle": self.idle,
+                "stages": self.timings.summary()
+            },
+            "cursor": {"stages": self.movement_thread.timings.summary()},
+            "actions": {"stages": {}}
+        }
+        if hasattr(self.action_controller, "get_metrics"):
+            action_metrics = self.action_controller.get_metrics()
+            metrics["actions"]["stages"].update(action_metrics.pop("stages"))
+            metrics["actions"].update(action_metrics)
+        return metrics
 
     def stop(self):
         self.running = False
+        self.stop_event.set()
         self.movement_thread.stop()
+        if hasattr(self.action_controller, "stop"):
+            self.action_controller.stop()
 
     def pause(self):
         self.paused = True
@@ -183,10 +523,21 @@ class GestureController:
     def unpause(self):
         self.paused = False
 
+    # Builds and warms up the new model off-thread, then publishes it with a single reference swap
     def reload_model(self):
-        self.interpreter = tflite.Interpreter(model_path = resource_path("model/gesture_model.tflite"))
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
-        self.GESTURE_LABELS = self.load_gesture_labels()
-        # print("Gesture model reloaded")
\ No newline at end of file
+        with self.model_lock:
+            self.reload_requests += 1
+            request = self.reload_requests
+        threading.Thread(target = self.load_model, args = (request,), daemon = True).start()
+
+    def load_model(self, request):
+        model = ModelBundle.load(runtime = self.config["runtime"], precision = self.config["precision"], threads = self.config["threads"])
+        model.warm_up()
+        sequence_model = SequenceModel.load()
+        with self.model_lock:
+            # A slower reload that was requested earlier must not replace a newer model
+            if request > self.loaded_request:
+                self.loaded_request = request
+                self.model = model
+                self.sequence_model = sequence_model
+        # print("Gesture model reloaded")
@@ -1,38 +1,64 @@
 import csv
+import dataset_tools
+from dataset_store import DatasetStore
+from features import NUM_MOTION_FEATURES
 from pose_action_manager import PoseActionManager
+from sequence_model import SEQUENCE_DATASET_DIR, SEQUENCE_LENGTH
 from utils import resource_path
 
 class GestureManager:
-    def __init__(self, gesture_file = resource_path("data/gestures.csv"), pose_file = resource_path("data/poses.txt")):
+    # Samples removed by clean_dataset are kept here so cleaning never loses recordings for good
+    REMOVED_FILE = "data/removed_samples.csv"
+
+    def __init__(self, gesture_file = resource_path("data/gestures.csv"), pose_file = resource_path("data/poses.txt"), pose_action_manager = None):
         self.gesture_file = gesture_file
         self.pose_file = pose_file
-        self.pose_action_manager = PoseActionManager()
+        self.pose_action_manager = pose_action_manager or PoseActionManager()
+        self.reload()
+
+    # Re-reads the dataset and pose list, e.g. after the data folder was restored
+    def reload(self):
+        self.dataset = DatasetStore(csv_file = self.gesture_file)
+        self.known_poses = set(self.get_all_poses())
+        # Recorded motion gestures, one (SEQUENCE_LENGTH, NUM_MOTION_FEATURES) window per sample
+        self.motions = DatasetStore(resource_path(SEQUENCE_DATASET_DIR), csv_file = None, sample_shape = (SEQUENCE_LENGTH, NUM_MOTION_FEATURES))
 
     def get_all_poses(self):
-        with open(self.pose_file, "r") as file:
-            return [line.strip() for line in file.readlines() if line.strip()]
+        try:
+            with open(self.pose_file, "r") as file:
+                return [line.strip() for line in file.readlines() if line.strip()]
+        except FileNotFoundError:
+            return []
         
     def add_pose(self, pose_name, processed_landmarks):
-        # Add landmark data to gestures.csv
-        with open(self.gesture_file, mode = "a", newline = "") as file:
-            writer = csv.writer(file)
-            writer.writerow([pose_name] + processed_landmarks)
+        # Buffer landmark data in the dataset store
+        self.dataset.append(pose_name, processed_landmarks)
 
         # Add pose name to poses.txt if its new
-        poses = self.get_all_poses()
-        if pose_name not in poses:
+        if pose_name not in self.known_poses:
             with open(self.pose_file, "a") as file:
                 file.write(pose_name + "\n")
+            self.known_poses.add(pose_name)
             self.pose_action_manager.add_pose(pose_name)
+
+    def get_all_motions(self):
+        return self.motions.get_poses()
+
+    def add_motion(self, motion_name, sequence):
+        # Motions share the mapping namespace with poses
+        if motion_name not in self.motions.get_poses() and motion_name not in self.pose_action_manager.get_mappings():
+            self.pose_action_manager.add_pose(motion_name)
+        self.motions.append(motion_name, sequence)
+
+    # Writes buffered samples to disk, called when a recording ends
+    def flush(self):
+        self.dataset.flush()
+        self.motions.flush()
             
     def delete_pose(self, pose_name):
-        # Remove all matching rows from gestures.csv
-        with open(self.gesture_file, "r") as file:
-            rows = list(csv.reader(file))
-        rows = [row for row in rows if row[0] != pose_name]
-        with open(self.gesture_file, 'w', newline = '') as file:
-            writer = csv.writer(file)
-            writer.writerows(rows)
+        # Remove the pose's samples from the dataset
+        self.dataset.delete_pose(pose_name)
+        self.motions.delete_pose(pose_name)
 
         # Remove pose name from poses.txt
         poses = self.get_all_poses()
@@ -41,6 +67,45 @@ class GestureManager:
             with open(self.pose_file, "w") as file:
                 for pose in poses:
                     file.write(pose + "\n")
+        self.known_poses.discard(pose_name)
 
         # Remove pose from mappings.json
-        self.pose_action_manager.delete_pose(pose_name)
\ No newline at end of file
+        self.pose_action_manager.delete_pose(pose_name)
+
+    def get_pose_counts(self):
+        return {pose: self.dataset.count(pose) for pose in self.dataset.get_poses()}
+
+    # Flushed copy of the recorded poses as (samples, labels, label names). A snapshot can be
+    # summarized on another thread while recording goes on.
+    def dataset_snapshot(self):
+        self.dataset.flush()
+        samples, labels, label_dict = self.dataset.load_arrays()
+        return samples, labels, sorted(label_dict, key = label_dict.get)
+
+    # Per pose counts, near-duplicates and outliers of the recorded poses, see dataset_tools
+    def summarize_dataset(self, config = None, snapshot = None):
+        samples, labels, label_names = snapshot or self.dataset_snapshot()
+        return dataset_tools.summarize(samples, labels, label_names, config)
+
+    # Removes near-duplicates and outliers from the recorded poses and returns the summary it acted on.
+    # A summary passed in is only reused while the pose counts still match it.
+    def clean_dataset(self, config = None, summary = None):
+        counts = {pose: count for pose, count in self.get_pose_counts().items() if count}
+        if summary is None or counts != {name: pose["samples"] for name, pose in summary["poses"].items()}:
+            summary = self.summarize_dataset(config)
+        samples, labels, label_dict = self.dataset.load_arrays()
+        keep = summary["keep"]
+        with open(resource_path(self.REMOVED_FILE), "a", newline = "") as file:
+            writer = csv.writer(file)
+            for pose, label in label_dict.items():
+                members = labels == label
+                removed = samples[members & ~keep]
+                if not len(removed):
+                    continue
+                for sample in removed:
+                    writer.writerow([pose] + sample.tolist())
+                self.dataset.replace_pose(pose, samples[members & keep])
+        return summary
+
+    def export_csv(self, path = None):
+        self.dataset.export_csv(path or self.gesture_file)
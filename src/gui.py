@@ -5,19 +5,25 @@ from tkinter import ttk
 from tkinter import messagebox
 from PIL import ImageTk, Image
 import sv_ttk
-import threading
-import mediapipe as mp
+import queue
 import shutil
+import threading
+import time
 
+from action_registry import action_names
+from dataset_tools import DEFAULT_DATASET_CONFIG, print_summary
 from gesture_manager import GestureManager
-from model_trainer import train_model
-from pose_action_manager import PoseActionManager
+from training_worker import TrainingProcess
 from pose_recorder import GestureRecorder
-from action_controller import ActionController
-from utils import resource_path
+from utils import import_mediapipe, resource_path
+
+# Cross-validated precision or recall below which training warns about a pose
+MIN_POSE_SCORE = 0.8
 
 class GestureApp:
-    def __init__(self, root, gesture_controller, camera_manager, settings_manager, camera_error = None):
+    # gesture_controller can be None while recognition is still loading, attach_gesture_controller
+    # brings it online later. pose_action_manager is needed in that case to show the mappings.
+    def __init__(self, root, gesture_controller, camera_manager, settings_manager, camera_error = None, pose_action_manager = None):
         # Window setup
         self.root = root
         self.root.title("GestCTRL")
@@ -25,10 +31,11 @@ class GestureApp:
         self.root.resizable(False, False)
 
         # Create objects to interact with backend data
-        self.pose_action_manager = PoseActionManager()
-        self.action_controller = ActionController()
-        self.gesture_manager = GestureManager()
-        self.gesture_controller = gesture_controller
+        # The mapping store and action dispatcher are shared with the gesture controller
+        self.pose_action_manager = pose_action_manager or gesture_controller.pose_action_manager
+        self.gesture_manager = GestureManager(pose_action_manager = self.pose_action_manager)
+        self.gesture_controller = None
+        self.action_controller = None
         self.camera_manager = camera_manager
         self.camera_error = camera_error
         self.settings_manager = settings_manager
@@ -48,13 +55,40 @@ class GestureApp:
         self.changed = False
 
         self.train_button_disabled = True
+        # Receives the dataset summary from its worker thread while the pre-training check runs
+        self.dataset_check = None
+        self.training_process = None
+        # Set once the current training run's model is in use and only cross-validation is left
+        self.model_installed = False
+
+        # Performance overlay on the preview, toggled with F3
+        self.show_metrics = self.settings_manager.get_config("metrics", {"overlay": False})["overlay"]
+        self.metrics_lines = []
+        self.metrics_updated = 0
+        self.root.bind("<F3>", self.toggle_metrics_overlay)
 
         self.start_ui()
+        if gesture_controller is not None:
+            self.attach_gesture_controller(gesture_controller)
         if self.camera_error:
             self.show_camera_error()
         if self.settings_manager.display_help == True:
             self.show_main_help_popup()
 
+    # Called from the Tk thread once recognition has finished loading
+    def attach_gesture_controller(self, gesture_controller):
+        self.gesture_controller = gesture_controller
+        self.action_controller = gesture_controller.action_controller
+        self.add_pose_button.config(state = "normal")
+        self.recognition_status.config(text = "")
+
+    def set_recognition_status(self, text):
+        self.recognition_status.config(text = text)
+
+    def set_camera_error(self, camera_error):
+        self.camera_error = camera_error
+        self.show_camera_error()
+
     def set_geometry(self, parent, width, height):
         screen_width = parent.winfo_screenwidth()
         screen_height = parent.winfo_screenheight()
@@ -101,6 +135,8 @@ class GestureApp:
             command=self.add_pose_ui
         )
         self.add_pose_button.place(x = 595, y = 420, width = 135, height = 40)
+        # Adding poses needs the recognition pipeline
+        self.add_pose_button.config(state = "disabled")
 
         # Train button
         self.train_button = ttk.Button(
@@ -112,6 +148,10 @@ class GestureApp:
         )
         self.train_button.place(x = 735, y = 420, width = 135, height = 40)
 
+        # Training progress
+        self.training_status = ttk.Label(self.root, text = "", anchor = "center")
+        self.training_status.place(x = 595, y = 468, width = 275)
+
         # Settings button
         self.settings_button = ttk.Button(
             self.root,
@@ -119,6 +159,10 @@ class GestureApp:
             command=self.settings_ui
         )
         self.settings_button.place(x = 840, y = 500)
+
+        # Shown while recognition is still starting up
+        self.recognition_status = ttk.Label(self.root, text = "Loading recognition...", anchor = "w")
+        self.recognition_status.place(x = 595, y = 505, width = 235)
         
         # Preview Frame
         self.preview_frame = ttk.Frame(self.root, width=650, height=450)
@@ -163,19 +207,139 @@ class GestureApp:
         restore_button.pack(pady=5)
 
     def train_model_clicked(self):
-        if self.train_button_disabled:
-            return 
-        def train_thread():
-            self.train_button.config(text = "Training...", image = self.train_icon)
-            print("Training started")
-            train_model()
-            self.gesture_controller.reload_model() # Reload to use the newly trained model
-            self.train_button.config(text = "Train")
-            self.train_button_disabled = True
-            self.changed = False
+        # While training the button cancels the run instead
+        if self.training_process is not None:
+            if self.model_installed:
+                question = "Stop cross-validation? The new model stays in use without recommended thresholds."
+            else:
+                question = "Stop training? The current model will be kept."
+            if messagebox.askyesno("Cancel Training", question):
+                self.training_process.cancel()
+            return
+        if self.train_button_disabled or self.dataset_check is not None:
+            return
+        # Summarizing runs a SciPy neighbour search over every sample, too slow for the Tk thread.
+        # The snapshot is taken here so recording can go on while the summary is computed.
+        dataset_config = self.settings_manager.get_config("dataset", DEFAULT_DATASET_CONFIG)
+        snapshot = self.gesture_manager.dataset_snapshot()
+        self.train_button.config(text = "Checking...")
+        self.training_status.config(text = "Checking recorded samples...")
+        self.dataset_check = queue.Queue()
+        threading.Thread(target = self.summarize_dataset, args = (self.dataset_check, dataset_config, snapshot), daemon = True).start()
+        self.root.after(100, self.poll_dataset_check, dataset_config)
+
+    def summarize_dataset(self, results, config, snapshot):
+        try:
+            results.put(self.gesture_manager.summarize_dataset(config, snapshot))
+        except Exception as e:
+            results.put(e)
+
+    def poll_dataset_check(self, config):
+        try:
+            summary = self.dataset_check.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self.poll_dataset_check, config)
+            return
+        self.dataset_check = None
+        if isinstance(summary, Exception):
+            self.training_status.config(text = "Dataset check failed")
+            messagebox.showerror("Dataset Check", str(summary))
+            self.update_train_button()
+            return
+        if not self.check_dataset(config, summary):
+            self.training_status.config(text = "")
             self.update_train_button()
-            print("Training complete")
-        threading.Thread(target = train_thread, daemon = True).start()
+            return
+        self.start_training(config)
+
+    def start_training(self, dataset_config):
+        self.train_button.config(text = "Training...", image = self.train_icon)
+        self.training_status.config(text = "Starting training...")
+        print("Training started")
+        self.training_process = TrainingProcess(balance = dataset_config["balance"])
+        self.model_installed = False
+        self.training_process.start()
+        self.root.after(200, self.poll_training)
+
+    # Offers to remove near-duplicates and outliers before training, returns False if the user cancelled
+    def check_dataset(self, config, summary):
+        print_summary(summary)
+        if not summary["duplicates"] and not summary["outliers"]:
+            return True
+        counts = ", ".join(f"{name} {pose['samples']}" for name, pose in summary["poses"].items())
+        answer = messagebox.askyesnocancel(
+            "Dataset Check",
+            f"Of {summary['samples']} recorded samples {summary['duplicates']} are near-duplicates and "
+            f"{summary['outliers']} look mislabeled or unusual.\n\nSamples per pose: {counts}\n\n"
+            f"Remove them before training? Removed samples are saved to {self.gesture_manager.REMOVED_FILE}."
+        )
+        if answer is None:
+            return False
+        if answer:
+            self.gesture_manager.clean_dataset(config, summary)
+        return True
+
+    # Progress arrives from the training process and is shown from the Tk thread
+    def poll_training(self):
+        for kind, payload in self.training_process.poll():
+            if kind == "progress":
+                accuracy = payload.get("accuracy", 0) * 100
+                if payload.get("stage") == "evaluation":
+                    self.training_status.config(text = f"Cross-validating fold {payload['fold']}/{payload['folds']}")
+                    continue
+                stage = "Motion epoch" if payload.get("stage") == "motion" else "Epoch"
+                self.training_status.config(text = f"{stage} {payload['epoch']}/{payload['max_epochs']} - Accuracy {accuracy:.1f}%")
+            elif kind == "done":
+                self.model_trained(payload)
+            else:
+                self.training_finished(kind, payload)
+                return
+        self.root.after(200, self.poll_training)
+
+    # The new model is used right away, the worker keeps cross-validating it in the background
+    def model_trained(self, metrics):
+        self.training_process.install()
+        self.model_installed = True
+        if self.gesture_controller is not None:
+            self.gesture_controller.reload_model() # Reload to use the newly trained model
+        self.changed = False
+        self.train_button.config(text = "Evaluating...")
+        self.training_status.config(text = f"Test Accuracy {metrics['test_accuracy'] * 100:.1f}% - cross-validating")
+        print("Training complete")
+
+    def training_finished(self, kind, payload):
+        self.training_process.join()
+        if kind == "evaluated":
+            self.training_process.install()
+            if self.gesture_controller is not None:
+                self.gesture_controller.reload_model() # Picks up the recommended thresholds
+            status = f"Cross-validated Accuracy {payload.get('accuracy', 0) * 100:.1f}%" if "accuracy" in payload else "Training complete"
+            self.warn_weak_poses(payload)
+        elif kind == "cancelled":
+            status = "Cross-validation cancelled" if self.model_installed else "Training cancelled"
+        else:
+            status = "Cross-validation failed" if self.model_installed else "Training failed"
+            messagebox.showerror("Training Error", payload)
+        self.training_process.cleanup()
+        self.training_process = None
+        self.training_status.config(text = status)
+        self.update_train_button()
+
+    # Points out poses the cross-validation found unreliable, they need more or cleaner samples
+    def warn_weak_poses(self, evaluation):
+        weak = [name for name, result in evaluation.get("poses", {}).items() if min(result["precision"], result["recall"]) < MIN_POSE_SCORE]
+        if not weak:
+            return
+        lines = [f"{name}: precision {evaluation['poses'][name]['precision'] * 100:.0f}%, recall {evaluation['poses'][name]['recall'] * 100:.0f}%" for name in weak]
+        messagebox.showwarning(
+            "Weak Poses",
+            "These poses are often confused:\n" + "\n".join(lines) + "\n\nRecording more samples of them and retraining should help."
+        )
+
+    def stop_training(self):
+        if self.training_process is not None:
+            self.training_process.stop()
+            self.training_process = None
 
     def update_train_button(self):
         if self.changed:
@@ -228,6 +392,10 @@ class GestureApp:
         self.add_pose_record_button = ttk.Button(self.add_pose_right_frame, text="Record Pose", command=self.record_button_clicked)
         self.add_pose_record_button.pack(pady=(5, 10))
 
+        #Add Motion Button
+        self.add_motion_record_button = ttk.Button(self.add_pose_right_frame, text="Record Motion", command=lambda: self.record_button_clicked(motion = True))
+        self.add_motion_record_button.pack(pady=(0, 10))
+
         if self.settings_manager.display_help:
             self.show_add_pose_help_popup()
 
@@ -238,24 +406,26 @@ class GestureApp:
         self.add_pose_tree.delete(*self.add_pose_tree.get_children())
         poses = self.gesture_manager.get_all_poses()
         for pose in poses:
-            self.add_pose_tree.insert("", "end", values = pose)
+            self.add_pose_tree.insert("", "end", values = (pose,))
+        for motion in self.gesture_manager.get_all_motions():
+            self.add_pose_tree.insert("", "end", values = (motion + " (motion)",))
     
     def entryFieldPlaceholder(self, event):
         if self.add_pose_entry.get() == "Insert Pose Name":
             self.add_pose_entry.delete(0, "end")
             self.add_pose_entry.config(fg="#FFFFFF")
 
-    def record_button_clicked(self):
+    def record_button_clicked(self, motion = False):
         new_pose = self.add_pose_name.get().strip()
         if not new_pose or new_pose == "Insert Pose Name":
             messagebox.showwarning("Warning", "Please Enter a Name", parent=self.add_pose_window)
             return
         
-        self.add_pose_record_button.config(state="disabled", text="Recording...")
-        self.pose_recorder = GestureRecorder(self.camera_manager)
+        self.add_pose_record_button.config(state="disabled", text="Recording..." if not motion else "Record Pose")
+        self.add_motion_record_button.config(state="disabled", text="Recording..." if motion else "Record Motion")
+        self.pose_recorder = GestureRecorder(self.gesture_controller, self.gesture_manager, motion, self.root)
         self.pose_recorder.start_recording(new_pose)
-        self.recording_thread = threading.Thread(target=self.pose_recorder.run, daemon=True)
-        self.recording_thread.start()
+        self.pose_recorder.start()
 
         self.add_pose_window.bind("<Return>", self.on_enter_pressed)
         self.add_pose_window.bind("<Escape>", self.on_escape_pressed)
@@ -277,7 +447,8 @@ class GestureApp:
         self.pose_recorder.stop()
 
         #Changing Button Back
-        self.add_pose_record_button.config(state="normal", text="Record Pose")    
+        self.add_pose_record_button.config(state="normal", text="Record Pose")
+        self.add_motion_record_button.config(state="normal", text="Record Motion")
         self.changed = True
         self.update_train_button()
         self.updateListPoses()
@@ -298,7 +469,11 @@ class GestureApp:
         pose_label.pack(pady = 20)
 
         # Dropdown for actions
-        actions = self.action_controller.get_actions() + ["Right Click", "Left Click", "Mouse Mode", "Neutral"]
+        # While recognition loads the list comes from the configured definitions
+        if self.action_controller is not None:
+            actions = self.action_controller.get_actions()
+        else:
+            actions = action_names(self.settings_manager.get_config("actions"))
         action = tk.StringVar(value = action)
         action_dropdown = ttk.Combobox(menu, textvariable = action, values = actions, state = "readonly")
         action_dropdown.pack(pady = 10)
@@ -344,17 +519,21 @@ class GestureApp:
         if frame is not None:
             frame = frame.copy()
 
-            hands = self.gesture_controller.hands
-            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
+            # Only draw the overlay, detection already ran on the gesture controller thread
+            result = self.gesture_controller.get_latest_result() if self.gesture_controller else None
+            if result is not None and result.hands:
+                # Already loaded by the gesture controller at this point
+                mp = import_mediapipe()
+                for hand in result.hands:
                     mp.solutions.drawing_utils.draw_landmarks(
                         frame,
-                        hand_landmarks,
+                        hand.landmarks,
                         mp.solutions.hands.HAND_CONNECTIONS
                     )
 
+            if self.show_metrics and self.gesture_controller is not None:
+                self.draw_metrics_overlay(frame)
+
             frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             img = Image.fromarray(frame)
 
@@ -374,6 +553,27 @@ class GestureApp:
 
         self.root.after(15, self.update_camera_preview)
 
+    def toggle_metrics_overlay(self, event = None):
+        self.show_metrics = not self.show_metrics
+
+    def draw_metrics_overlay(self, frame):
+        # Percentiles are recomputed twice a second, not on every preview frame
+        now = time.monotonic()
+        if now - self.metrics_updated > 0.5:
+            self.metrics_updated = now
+            metrics = self.gesture_controller.get_metrics()
+            recognition = metrics["recognition"]
+            stages = recognition["stages"]
+            action_stages = metrics["actions"]["stages"]
+            self.metrics_lines = [
+                f"Camera {metrics['camera']['fps']:.1f} fps  Processed {recognition['fps']:.1f} fps",
+                f"Dropped {recognition['dropped_frames']}",
+                f"Detect {stages.get('detection', {}).get('p50', 0):.1f} ms  Classify {stages.get('inference', {}).get('p50', 0):.2f} ms  Frame {stages.get('total', {}).get('p90', 0):.1f} ms p90",
+                f"Gesture to action {action_stages.get('gesture_to_action', {}).get('p50', 0):.1f} ms"
+            ]
+        for line_number, line in enumerate(self.metrics_lines):
+            cv2.putText(frame, line, (10, 25 + line_number * 22), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 0), 1, cv2.LINE_AA)
+
     def show_camera_error(self):
         messagebox.showerror("Camera Error", f"Failed to open camera:\n{self.camera_error}")
 
@@ -401,6 +601,8 @@ class GestureApp:
         shutil.copytree(resource_path('./default_data/data'), './data')
         shutil.copytree(resource_path('./default_data/model'), './model')
 
+        self.pose_action_manager.reload()
+        self.gesture_manager.reload()
         self.changed = True
         self.update_train_button()
         self.updateList()
@@ -441,7 +643,7 @@ class GestureApp:
     def show_add_pose_help_popup(self):
         help_window = Toplevel(self.add_pose_window)
         help_window.title("Adding a New Pose")
-        self.set_geometry(help_window, 400, 300)
+        self.set_geometry(help_window, 400, 340)
         help_window.resizable(False, False)
 
         help_window.lift()
@@ -454,6 +656,7 @@ class GestureApp:
             "- Or type the name of an existing pose\n"
             "- Click 'Record Pose' to start capturing samples\n"
             "- Press ENTER to record a frame\n"
+            "- For motions (swipes, circles, waves) click 'Record Motion', press ENTER and perform the motion once within the next second\n"
             "- Press ESC to finish recording\n"
             "- After recording, retrain the model to update it"
         )
@@ -0,0 +1,298 @@
+import shutil
+import subprocess
+import sys
+import threading
+
+# Backends inject input events for the ActionController. Key names follow pyautogui's naming
+# ("ctrl", "shift", "f5", "+", ...), backends translate them to their own names.
+
+class InputBackend:
+    name = "base"
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def hotkey(self, *keys):
+        raise NotImplementedError
+
+    def write(self, text):
+        raise NotImplementedError
+
+    # amount is in wheel notches, positive amounts scroll up / right
+    def scroll(self, amount, horizontal = False):
+        raise NotImplementedError
+
+    def mouse_down(self, button = "left"):
+        raise NotImplementedError
+
+    def mouse_up(self, button = "left"):
+        raise NotImplementedError
+
+    def move_cursor(self, x, y):
+        raise NotImplementedError
+
+    def get_cursor_position(self):
+        raise NotImplementedError
+
+    def get_screen_size(self):
+        raise NotImplementedError
+
+    # Launches without waiting so a long running program never blocks other actions
+    def run_command(self, command):
+        subprocess.Popen(command, shell = isinstance(command, str))
+
+class PyAutoGuiBackend(InputBackend):
+    name = "pyautogui"
+    # On Windows pyautogui passes scroll amounts through as raw wheel units, one notch is 120
+    WHEEL_DELTA = 120
+    MOUSEEVENTF_HWHEEL = 0x1000
+
+    def __init__(self):
+        import pyautogui
+        self.pyautogui = pyautogui
+
+    # _pause = False skips pyautogui's default 0.1s sleep after every call, macros have explicit waits
+    def press(self, key):
+        self.pyautogui.press(key, _pause = False)
+
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys, _pause = False)
+
+    def write(self, text):
+        self.pyautogui.write(text, _pause = False)
+
+    def scroll(self, amount, horizontal = False):
+        if sys.platform == "win32":
+            amount *= self.WHEEL_DELTA
+            # pyautogui's hscroll scrolls vertically on Windows
+            if horizontal:
+                import ctypes
+                ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_HWHEEL, 0, 0, int(amount), 0)
+                return
+        if horizontal:
+            self.pyautogui.hscroll(amount, _pause = False)
+        else:
+            self.pyautogui.scroll(amount, _pause = False)
+
+    def mouse_down(self, button = "left"):
+        self.pyautogui.mouseDown(button = button, _pause = False)
+
+    def mouse_up(self, button = "left"):
+        self.pyautogui.mouseUp(button = button, _pause = False)
+
+    def move_cursor(self, x, y):
+        self.pyautogui.moveTo(x, y, _pause = False)
+
+    def get_cursor_position(self):
+        return tuple(self.pyautogui.position())
+
+    def get_screen_size(self):
+        return tuple(self.pyautogui.size())
+
+# X11 keysym names for pyautogui's key names, xdotool takes the same names
+X11_KEY_NAMES = {
+    "ctrl": "ctrl", "alt": "alt", "shift": "shift", "win": "super", "cmd": "super",
+    "enter": "Return", "return": "Return", "esc": "Escape", "escape": "Escape", "tab": "Tab",
+    "space": "space", "backspace": "BackSpace", "delete": "Delete", "del": "Delete",
+    "up": "Up", "down": "Down", "left": "Left", "right": "Right",
+    "home": "Home", "end": "End", "pageup": "Prior", "pagedown": "Next",
+    "+": "plus", "-": "minus", "=": "equal", ",": "comma", ".": "period", "/": "slash",
+    "volumeup": "XF86AudioRaiseVolume", "volumedown": "XF86AudioLowerVolume", "volumemute": "XF86AudioMute"
+}
+
+def x11_key_name(key):
+    if key in X11_KEY_NAMES:
+        return X11_KEY_NAMES[key]
+    if len(key) > 1 and key[0] == "f" and key[1:].isdigit():
+        return key.upper()
+    return key
+
+# Injects through the XTest extension over one X connection kept open for the whole run. An event
+# is a single request on that connection, without a process start or pyautogui's per-call checks,
+# so it keeps up with the cursor thread's output rate. Needs python-xlib, which pyautogui already
+# uses on Linux.
+class XlibBackend(InputBackend):
+    name = "xlib"
+    # xdotool's modifier aliases aren't keysyms
+    MODIFIERS = {"ctrl": "Control_L", "alt": "Alt_L", "shift": "Shift_L", "super": "Super_L"}
+    BUTTONS = {"left": 1, "middle": 2, "right": 3}
+    CHARACTERS = {"\n": "enter", "\t": "tab", " ": "space"}
+
+    def __init__(self):
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+        XK.load_keysym_group("xf86")
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = display.Display()
+        if not self.display.has_extension("XTEST"):
+            raise RuntimeError("The X server has no XTEST extension")
+        self.screen = self.display.screen()
+        self.shift = self.display.keysym_to_keycode(XK.string_to_keysym("Shift_L"))
+        # Actions and the cursor are sent from different threads over the same connection
+        self.lock = threading.Lock()
+
+    # Keycodes to hold down for one key, with Shift in front where the keysym is on the shifted level
+    def keycodes(self, key):
+        name = x11_key_name(key)
+        keysym = self.XK.string_to_keysym(self.MODIFIERS.get(name, name))
+        if keysym == self.X.NoSymbol and len(key) == 1:
+            # Latin-1 keysyms equal the code point, the rest use the Unicode keysym range
+            keysym = ord(key) if ord(key) < 0x100 else 0x01000000 | ord(key)
+        keycode = self.display.keysym_to_keycode(keysym)
+        if not keycode:
+            raise ValueError("No key for " + repr(key))
+        if self.display.keycode_to_keysym(keycode, 0) != keysym and self.display.keycode_to_keysym(keycode, 1) == keysym:
+            return [self.shift, keycode]
+        return [keycode]
+
+    # events are (event type, key or button) pairs, flushed together
+    def send(self, events):
+        with self.lock:
+            for event_type, detail in events:
+                self.xtest.fake_input(self.display, event_type, detail)
+            self.display.flush()
+
+    def chord(self, keys):
+        # dict.fromkeys drops a repeated Shift while keeping the order
+        keycodes = list(dict.fromkeys(keycode for key in keys for keycode in self.keycodes(key)))
+        self.send([(self.X.KeyPress, keycode) for keycode in keycodes] + [(self.X.KeyRelease, keycode) for keycode in reversed(keycodes)])
+
+    def press(self, key):
+        self.chord([key])
+
+    def hotkey(self, *keys):
+        self.chord(keys)
+
+    def write(self, text):
+        for character in text:
+            self.chord([self.CHARACTERS.get(character, character)])
+
+    def scroll(self, amount, horizontal = False):
+        if horizontal:
+            button = 7 if amount > 0 else 6
+        else:
+            button = 4 if amount > 0 else 5
+        self.send([(event, button) for _ in range(abs(int(amount))) for event in (self.X.ButtonPress, self.X.ButtonRelease)])
+
+    def mouse_down(self, button = "left"):
+        self.send([(self.X.ButtonPress, self.BUTTONS[button])])
+
+    def mouse_up(self, button = "left"):
+        self.send([(self.X.ButtonRelease, self.BUTTONS[button])])
+
+    def move_cursor(self, x, y):
+        with self.lock:
+            self.xtest.fake_input(self.display, self.X.MotionNotify, x = int(x), y = int(y))
+            self.display.flush()
+
+    def get_cursor_position(self):
+        with self.lock:
+            pointer = self.screen.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def get_screen_size(self):
+        return self.screen.width_in_pixels, self.screen.height_in_pixels
+
+# Drives X11 through the xdotool command line tool, for setups without python-xlib. Every event
+# starts an xdotool process, which is fine for discrete actions but too slow for the cursor at
+# full output rate, the xlib backend suits that better.
+class XdotoolBackend(InputBackend):
+    name = "xdotool"
+    BUTTONS = {"left": "1", "middle": "2", "right": "3"}
+
+    def __init__(self):
+        self.executable = shutil.which("xdotool")
+        if self.executable is None:
+            raise RuntimeError("xdotool is not installed")
+
+    def run(self, *args):
+        return subprocess.run([self.executable, *args], check = True, capture_output = True, text = True).stdout
+
+    def press(self, key):
+        self.run("key", x11_key_name(key))
+
+    def hotkey(self, *keys):
+        self.run("key", "+".join(x11_key_name(key) for key in keys))
+
+    def write(self, text):
+        self.run("type", "--delay", "0", "--", text)
+
+    def scroll(self, amount, horizontal = False):
+        if amount == 0:
+            return
+        if horizontal:
+            button = "7" if amount > 0 else "6"
+        else:
+            button = "4" if amount > 0 else "5"
+        self.run("click", "--repeat", str(abs(int(amount))), "--delay", "0", button)
+
+    def mouse_down(self, button = "left"):
+        self.run("mousedown", self.BUTTONS[button])
+
+    def mouse_up(self, button = "left"):
+        self.run("mouseup", self.BUTTONS[button])
+
+    def move_cursor(self, x, y):
+        self.run("mousemove", str(int(x)), str(int(y)))
+
+    def get_cursor_position(self):
+        values = dict(line.split("=") for line in self.run("getmouselocation", "--shell").split())
+        return int(values["X"]), int(values["Y"])
+
+    def get_screen_size(self):
+        width, height = self.run("getdisplaygeometry").split()
+        return int(width), int(height)
+
+# Injects nothing and records every call, for tests and headless runs
+class NullBackend(InputBackend):
+    name = "null"
+
+    def __init__(self, screen_size = (1920, 1080)):
+        self.screen_size = screen_size
+        self.position = (0, 0)
+        self.events = []
+        self.lock = threading.Lock()
+
+    def record(self, *event):
+        with self.lock:
+            self.events.append(event)
+
+    def press(self, key):
+        self.record("press", key)
+
+    def hotkey(self, *keys):
+        self.record("hotkey", *keys)
+
+    def write(self, text):
+        self.record("write", text)
+
+    def scroll(self, amount, horizontal = False):
+        self.record("scroll", amount, horizontal)
+
+    def mouse_down(self, button = "left"):
+        self.record("mouse_down", button)
+
+    def mouse_up(self, button = "left"):
+        self.record("mouse_up", button)
+
+    def move_cursor(self, x, y):
+        self.position = (x, y)
+        self.record("move_cursor", x, y)
+
+    def get_cursor_position(self):
+        return self.position
+
+    def get_screen_size(self):
+        return self.screen_size
+
+    def run_command(self, command):
+        self.record("run_command", command)
+
+BACKENDS = {backend.name: backend for backend in [PyAutoGuiBackend, XlibBackend, XdotoolBackend, NullBackend]}
+
+def create_backend(name = "pyautogui"):
+    if name not in BACKENDS:
+        raise ValueError("Unknown input backend: " + str(name))
+    return BACKENDS[name]()
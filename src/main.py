@@ -1,39 +1,109 @@
-import threading
 import time
-import tkinter as tk
-from camera_manager import CameraManager
-from gui import GestureApp
-from gesture_controller import GestureController
-from settings_manager import SettingsManager
+START_TIME = time.perf_counter()
 
-def main():
-    settings_manager = SettingsManager()
-    camera_manager = CameraManager(settings_manager.get_webcam_index_setting())
-    camera_error = None
+import multiprocessing
+import threading
+from metrics import MetricsLogger, StartupReport
+
+# Startup is staged so the window shows up first: only Tk, the GUI and the settings are loaded
+# before it appears. The camera, MediaPipe, the input backend and the classifier are brought up by
+# a background loader and handed to the GUI once they are ready.
 
+def load_recognition(startup, settings_manager, camera_manager, pose_action_manager, loaded):
     try:
-        camera_manager.start()
-    except RuntimeError as e:
-        print("Camera Error:", str(e))
-        camera_error = str(e)
+        with startup.stage("camera"):
+            try:
+                camera_manager.start()
+            except RuntimeError as e:
+                print("Camera Error:", str(e))
+                loaded["camera_error"] = str(e)
+
+        with startup.stage("import recognition"):
+            from action_controller import ActionController
+            from gesture_controller import GestureController
+
+        with startup.stage("action controller"):
+            input_config = settings_manager.get_config("input", {"backend": "pyautogui"})
+            action_controller = ActionController(input_config["backend"], settings_manager.get_config("actions"))
+
+        with startup.stage("gesture controller"):
+            gesture_controller = GestureController(camera_manager, pose_action_manager, action_controller, config = settings_manager.get_config("recognition"))
+
+        with startup.stage("model warm up"):
+            gesture_controller.model.warm_up()
+        loaded["gesture_controller"] = gesture_controller
+    except Exception as e:
+        print("Recognition Error:", str(e))
+        loaded["error"] = str(e)
+    loaded["done"] = True
+
+def main():
+    startup = StartupReport(START_TIME)
+    with startup.stage("import gui"):
+        import tkinter as tk
+        from camera_manager import CameraManager
+        from gui import GestureApp
+        from pose_action_manager import PoseActionManager
+        from settings_manager import SettingsManager
+
+    with startup.stage("settings"):
+        settings_manager = SettingsManager()
+        camera_config = settings_manager.get_config("camera", {"width": None, "height": None, "fps": None})
+        camera_manager = CameraManager(settings_manager.get_webcam_index_setting(), camera_config["width"], camera_config["height"], camera_config["fps"])
+        pose_action_manager = PoseActionManager()
+
+    with startup.stage("window"):
+        root = tk.Tk()
+        app = GestureApp(root, None, camera_manager, settings_manager, pose_action_manager = pose_action_manager)
+        root.update()
+    startup.mark("first window")
+
+    loaded = {"done": False}
+    loader = threading.Thread(target = load_recognition, args = (startup, settings_manager, camera_manager, pose_action_manager, loaded), daemon = True)
+    loader.start()
+
+    running = {"gesture_thread": None, "metrics_logger": None}
+
+    # Tk isn't thread safe, so the loader's results are picked up from the Tk thread
+    def check_loader():
+        if not loaded["done"]:
+            root.after(50, check_loader)
+            return
+        if "camera_error" in loaded:
+            app.set_camera_error(loaded["camera_error"])
+        if "error" in loaded:
+            app.set_recognition_status("Recognition failed: " + loaded["error"])
+            return
 
-    gesture_controller = GestureController(camera_manager)
-    gesture_thread = threading.Thread(target = gesture_controller.run, daemon = True)
-    gesture_thread.start()
+        gesture_controller = loaded["gesture_controller"]
+        gesture_thread = threading.Thread(target = gesture_controller.run, daemon = True)
+        gesture_thread.start()
+        running["gesture_thread"] = gesture_thread
+        app.attach_gesture_controller(gesture_controller)
+        print("Gesture controller started. Press Ctrl+C to exit.")
 
-    print("Gesture controller started. Press Ctrl+C to exit.")
+        metrics_config = settings_manager.get_config("metrics", {"log_file": None, "log_interval": 5.0})
+        if metrics_config["log_file"]:
+            running["metrics_logger"] = MetricsLogger(gesture_controller.get_metrics, metrics_config["log_file"], metrics_config["log_interval"])
+            running["metrics_logger"].start()
 
-    root = tk.Tk()
-    app = GestureApp(root, gesture_controller, camera_manager, settings_manager, camera_error)
+        startup.mark("recognition ready")
+        startup.print_report()
 
     def on_close():
-        gesture_controller.stop()
-        gesture_thread.join()
+        app.stop_training()
+        if running["metrics_logger"]:
+            running["metrics_logger"].stop()
+        if running["gesture_thread"]:
+            loaded["gesture_controller"].stop()
+            running["gesture_thread"].join()
         camera_manager.stop()
         root.destroy()
 
     root.protocol("WM_DELETE_WINDOW", on_close)  # Handle window closing properly
+    root.after(50, check_loader)
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    multiprocessing.freeze_support() # Training runs in a separate process, also in packaged builds
+    main()
@@ -0,0 +1,118 @@
+import contextlib
+import json
+import threading
+import time
+import numpy as np
+
+# Fixed size ring buffers of per-stage durations in seconds. Recording is a couple of array
+# writes so it can stay on in the recognition loop.
+class StageTimings:
+    def __init__(self, stages, capacity = 1024):
+        self.stages = list(stages)
+        self.capacity = capacity
+        self.samples = np.zeros((len(self.stages), capacity), dtype = np.float64)
+        self.counts = np.zeros(len(self.stages), dtype = np.int64)
+        self.stage_index = {stage: index for index, stage in enumerate(self.stages)}
+
+    def record(self, stage, seconds):
+        index = self.stage_index[stage]
+        self.samples[index, self.counts[index] % self.capacity] = seconds
+        self.counts[index] += 1
+
+    def get_samples(self, stage):
+        index = self.stage_index[stage]
+        return self.samples[index, :min(self.counts[index], self.capacity)]
+
+    # Returns {stage: {"count", "mean", "p50", "p90", "p99", "max"}} in milliseconds
+    def summary(self, percentiles = (50, 90, 99)):
+        report = {}
+        for stage in self.stages:
+            samples = self.get_samples(stage) * 1000
+            if not len(samples):
+                continue
+            values = np.percentile(samples, percentiles)
+            report[stage] = {"count": int(self.counts[self.stage_index[stage]]), "mean": float(samples.mean())}
+            report[stage].update({f"p{percentile}": float(value) for percentile, value in zip(percentiles, values)})
+            report[stage]["max"] = float(samples.max())
+        return report
+
+    def reset(self):
+        self.counts[:] = 0
+
+# Events per second over the last `capacity` events
+class RateMeter:
+    def __init__(self, capacity = 120):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype = np.float64)
+        self.count = 0
+
+    def tick(self, timestamp = None):
+        self.times[self.count % self.capacity] = time.monotonic() if timestamp is None else timestamp
+        self.count += 1
+
+    def rate(self):
+        samples = min(self.count, self.capacity)
+        if samples < 2:
+            return 0.0
+        newest = self.times[(self.count - 1) % self.capacity]
+        oldest = self.times[(self.count - samples) % self.capacity]
+        # Nothing happened for a while, don't keep reporting the last known rate
+        if time.monotonic() - newest > 2 or newest <= oldest:
+            return 0.0
+        return (samples - 1) / (newest - oldest)
+
+# Periodically appends a metrics snapshot as one JSON line to a file
+class MetricsLogger(threading.Thread):
+    def __init__(self, get_metrics, path, interval = 5.0):
+        super().__init__()
+        self.daemon = True
+        self.get_metrics = get_metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with open(self.path, "a") as file:
+                file.write(json.dumps(self.get_metrics()) + "\n")
+
+    def stop(self):
+        self.stopped.set()
+
+# Wall clock cost of each startup stage and when milestones such as the first window were reached,
+# both relative to start. Stages can be recorded from the loader thread as well.
+class StartupReport:
+    def __init__(self, start = None):
+        self.start = start if start is not None else time.perf_counter()
+        self.stages = []
+        self.marks = []
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages.append((name, time.perf_counter() - stage_start))
+
+    def mark(self, name):
+        with self.lock:
+            self.marks.append((name, time.perf_counter() - self.start))
+
+    # Durations in ms
+    def summary(self):
+        with self.lock:
+            return {
+                "stages": {name: seconds * 1000 for name, seconds in self.stages},
+                "marks": {name: seconds * 1000 for name, seconds in self.marks}
+            }
+
+    def print_report(self):
+        summary = self.summary()
+        print("Startup:")
+        for name, ms in summary["stages"].items():
+            print(f"  {name:<24}{ms:>9.1f} ms")
+        for name, ms in summary["marks"].items():
+            print(f"  {name + ' at':<24}{ms:>9.1f} ms")
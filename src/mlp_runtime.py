@@ -0,0 +1,87 @@
+import numpy as np
+
+# NumPy inference for the pose classifier's dense network, so recognition doesn't have to import
+# TensorFlow. The trainer stores every layer's weights in the model artifact as float32 and as int8
+# with one scale per output unit; int8 weights are dequantized once when the model is loaded, so
+# they shrink the artifact but run no faster than float32.
+
+PRECISIONS = ["float32", "int8"]
+
+def relu(x):
+    return np.maximum(x, 0, out = x)
+
+def softmax(x):
+    x -= x.max(axis = -1, keepdims = True)
+    np.exp(x, out = x)
+    x /= x.sum(axis = -1, keepdims = True)
+    return x
+
+def linear(x):
+    return x
+
+ACTIVATIONS = {"relu": relu, "softmax": softmax, "linear": linear}
+
+# Symmetric per output unit quantization, returns (int8 kernel, float32 scales)
+def quantize_kernel(kernel):
+    scales = np.abs(kernel).max(axis = 0) / 127
+    scales[scales == 0] = 1
+    return np.round(kernel / scales).astype(np.int8), scales.astype(np.float32)
+
+def dequantize_kernel(quantized, scales):
+    return quantized.astype(np.float32) * scales
+
+# Turns a list of (kernel, bias, activation) into artifact sections and the metadata describing them
+def export_layers(layers):
+    sections = {}
+    shapes = {}
+    for index, (kernel, bias, activation) in enumerate(layers):
+        if activation not in ACTIVATIONS:
+            raise ValueError("Unsupported activation: " + str(activation))
+        quantized, scales = quantize_kernel(np.asarray(kernel, dtype = np.float32))
+        arrays = {
+            f"dense{index}.kernel": np.asarray(kernel, dtype = np.float32),
+            f"dense{index}.kernel_int8": quantized,
+            f"dense{index}.scale": scales,
+            f"dense{index}.bias": np.asarray(bias, dtype = np.float32)
+        }
+        for name, array in arrays.items():
+            sections[name] = array.tobytes()
+            shapes[name] = list(array.shape)
+    metadata = {"activations": [activation for _, _, activation in layers], "shapes": shapes}
+    return sections, metadata
+
+def has_layers(artifact):
+    return "mlp" in artifact.metadata and artifact.has_section("dense0.kernel")
+
+class NumpyMLP:
+    def __init__(self, layers):
+        # (kernel, bias, activation function) per dense layer
+        self.layers = [(kernel, bias, ACTIVATIONS[activation]) for kernel, bias, activation in layers]
+        self.input_shape = (1, self.layers[0][0].shape[0])
+
+    @classmethod
+    def from_artifact(cls, artifact, precision = "float32"):
+        if precision not in PRECISIONS:
+            raise ValueError("Unsupported precision: " + str(precision))
+        metadata = artifact.metadata["mlp"]
+        shapes = metadata["shapes"]
+
+        # Copied out of the mapping so the file isn't kept open
+        def array(name, dtype):
+            return np.frombuffer(artifact.section(name), dtype = dtype).reshape(shapes[name]).copy()
+
+        layers = []
+        for index, activation in enumerate(metadata["activations"]):
+            if precision == "int8":
+                kernel = dequantize_kernel(array(f"dense{index}.kernel_int8", np.int8), array(f"dense{index}.scale", np.float32))
+            else:
+                kernel = array(f"dense{index}.kernel", np.float32)
+            layers.append((kernel, array(f"dense{index}.bias", np.float32), activation))
+        return cls(layers)
+
+    # Same contract as the TFLite runtime: (N, features) float32 in, (N, classes) probabilities out
+    def classify(self, batch):
+        x = batch
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x
@@ -0,0 +1,78 @@
+import json
+import mmap
+import os
+import struct
+
+# Single file model artifact: a small JSON header describing the model (labels, feature schema,
+# training data hash, metrics) followed by named binary sections such as the TFLite flatbuffer.
+#
+# Layout: MAGIC | uint32 format version | uint32 header length | header JSON | section data
+
+ARTIFACT_PATH = "model/gesture_model.artifact"
+# Cross-validation report of the model, written by the trainer once the model is installed
+EVALUATION_REPORT_PATH = "model/evaluation_report.json"
+
+MAGIC = b"GESTCTRL"
+FORMAT_VERSION = 1
+PREFIX = struct.Struct("<8sII")
+ALIGNMENT = 16
+
+def save_artifact(path, sections, metadata):
+    header = dict(metadata)
+    header["sections"] = {}
+    offset = 0
+    for name, data in sections.items():
+        header["sections"][name] = {"offset": offset, "length": len(data)}
+        offset += align(len(data))
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (align(PREFIX.size + len(header_bytes)) - PREFIX.size - len(header_bytes))
+
+    # Write next to the target and rename so a reader never sees a partial artifact
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        file.write(header_bytes)
+        for data in sections.values():
+            file.write(data)
+            file.write(b"\0" * (align(len(data)) - len(data)))
+    os.replace(temp_path, path)
+
+def align(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+class ModelArtifact:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, header_length = PREFIX.unpack_from(self.buffer)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("Not a gesture model artifact: " + path)
+        if version > FORMAT_VERSION:
+            self.close()
+            raise ValueError("Unsupported model artifact version: " + str(version))
+        self.metadata = json.loads(bytes(self.buffer[PREFIX.size:PREFIX.size + header_length]))
+        self.data_offset = PREFIX.size + header_length
+
+    @property
+    def labels(self):
+        return self.metadata.get("labels", [])
+
+    def has_section(self, name):
+        return name in self.metadata["sections"]
+
+    # Returns a zero-copy view into the mapped file, only valid until close()
+    def section(self, name):
+        info = self.metadata["sections"][name]
+        start = self.data_offset + info["offset"]
+        return memoryview(self.buffer)[start:start + info["length"]]
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
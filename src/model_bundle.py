@@ -0,0 +1,127 @@
+import json
+import os
+import numpy as np
+from features import FEATURE_SCHEMA_VERSION
+from mlp_runtime import PRECISIONS as NUMPY_PRECISIONS, NumpyMLP, has_layers
+from model_artifact import ARTIFACT_PATH, EVALUATION_REPORT_PATH, ModelArtifact
+from utils import resource_path
+
+# Runtimes the classifier can run on. "auto" runs float32 on NumPy and the quantized variants on
+# TFLite, and falls back to TFLite for models trained before the weights were exported.
+RUNTIMES = ["auto", "numpy", "tflite"]
+# Precisions the trainer exports. NumPy runs float32 and int8, TFLite all of them. NumPy's int8
+# weights are dequantized on load, so they only save storage; TFLite's int8 model runs quantized.
+PRECISIONS = ["float32", "dynamic", "float16", "int8"]
+
+def load_tflite():
+    # The standalone runtime is much lighter than TensorFlow, which is only imported when missing
+    try:
+        import tflite_runtime.interpreter as tflite
+    except ImportError:
+        import tensorflow.lite as tflite
+    return tflite
+
+class TFLiteRuntime:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.input_shape = tuple(self.input_details[0]['shape'])
+        self.batch_size = self.input_shape[0]
+
+    # threads = None leaves the thread count to TFLite
+    @classmethod
+    def from_content(cls, content, threads = None):
+        return cls(load_tflite().Interpreter(model_content = content, num_threads = threads))
+
+    @classmethod
+    def from_file(cls, path, threads = None):
+        return cls(load_tflite().Interpreter(model_path = path, num_threads = threads))
+
+    def classify(self, batch):
+        # The interpreter input is resized only when the number of hands changes
+        if self.batch_size != len(batch):
+            self.interpreter.resize_tensor_input(self.input_details[0]['index'], batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(batch)
+        self.interpreter.set_tensor(self.input_details[0]['index'], batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_details[0]['index'])
+
+# Everything the recognition loop needs from a trained model. A bundle is never changed after it is
+# published, reloading builds a new bundle and swaps the reference.
+class ModelBundle:
+    def __init__(self, runtime, labels, metadata = None, thresholds = None):
+        self.runtime = runtime
+        self.input_shape = runtime.input_shape
+        self.labels = labels
+        self.metadata = metadata or {}
+        # Enter thresholds by pose recommended by the trainer's cross-validation
+        self.thresholds = thresholds or {}
+
+    @classmethod
+    def load(cls, artifact_path = resource_path(ARTIFACT_PATH), runtime = "auto", precision = "float32", threads = None):
+        if runtime not in RUNTIMES:
+            raise ValueError("Unknown model runtime: " + str(runtime))
+        if precision not in PRECISIONS:
+            raise ValueError("Unknown model precision: " + str(precision))
+        if os.path.exists(artifact_path):
+            return cls.load_artifact(artifact_path, runtime, precision, threads)
+        # Models trained before the artifact existed keep their labels in poses.txt
+        return cls.load_legacy(runtime = runtime, precision = precision, threads = threads)
+
+    @classmethod
+    def load_artifact(cls, artifact_path, runtime = "auto", precision = "float32", threads = None):
+        with ModelArtifact(artifact_path) as artifact:
+            if artifact.metadata.get("feature_schema") != FEATURE_SCHEMA_VERSION:
+                print("Warning: gesture model was trained on a different feature schema. Retrain to fix predictions.")
+            thresholds = load_thresholds(os.path.join(os.path.dirname(artifact_path), os.path.basename(EVALUATION_REPORT_PATH)), artifact.metadata)
+            numpy_precisions = NUMPY_PRECISIONS if runtime == "numpy" else ["float32"]
+            if runtime != "tflite" and precision in numpy_precisions and has_layers(artifact):
+                return cls(NumpyMLP.from_artifact(artifact, precision), artifact.labels, artifact.metadata, thresholds)
+            if runtime == "numpy":
+                print(f"Warning: NumPy runtime can't run this model as {precision}, using TFLite.")
+
+            section = "tflite" if precision == "float32" else "tflite_" + precision
+            if not artifact.has_section(section):
+                print(f"Warning: gesture model has no {precision} variant, using float32. Retrain to export it.")
+                section = "tflite"
+            # The TFLite interpreter only accepts the flatbuffer as bytes
+            return cls(TFLiteRuntime.from_content(bytes(artifact.section(section)), threads), artifact.labels, artifact.metadata, thresholds)
+
+    @classmethod
+    def load_legacy(cls, model_path = resource_path("model/gesture_model.tflite"), labels_path = resource_path("data/poses.txt"), runtime = "auto", precision = "float32", threads = None):
+        # Only the float32 TFLite model exists, "python model_trainer.py convert" exports the rest
+        if runtime == "numpy":
+            print(f"Warning: NumPy runtime can't run this model as {precision}, using TFLite.")
+        if precision != "float32":
+            print(f"Warning: gesture model has no {precision} variant, using float32. Retrain to export it.")
+        return cls(TFLiteRuntime.from_file(model_path, threads), load_labels(labels_path))
+
+    # Runs one inference so the first real frame doesn't pay for lazy initialization
+    def warm_up(self):
+        self.classify(np.zeros(self.input_shape, dtype = np.float32))
+
+    def classify(self, batch):
+        return self.runtime.classify(batch)
+
+# Recommended enter thresholds from the cross-validation report, only if it was made for this model's
+# training data. Evaluation finishes after the model is installed, until then there are none.
+def load_thresholds(report_path, metadata):
+    try:
+        with open(report_path, "r") as file:
+            report = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if "data_hash" not in metadata or report.get("data_hash") != metadata["data_hash"]:
+        return {}
+    return report.get("thresholds", {})
+
+def load_labels(labels_path = resource_path("data/poses.txt")):
+    try:
+        with open(labels_path, "r") as file:
+            return [line.strip() for line in file if line.strip()]
+    except FileNotFoundError:
+        # print("Warning: poses.txt not found. Using empty label list.")
+        return []
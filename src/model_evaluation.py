@@ -0,0 +1,169 @@
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import threading
+import numpy as np
+from pose_state import FALLBACK_ENTER
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+from sklearn.model_selection import StratifiedKFold
+
+# Cross-validated evaluation of the pose classifier. Every fold is trained with the same recipe as
+# the shipped model (model_trainer.fit_classifier, warm started from the same previous model) in its
+# own process. The out-of-fold predictions of all folds give the confusion matrix, per pose
+# precision and recall, and the enter threshold recommended for the pose state machine.
+#
+# The recorded samples are clean, held poses without transitions or stray hands, so precision on
+# them says nothing about false triggers. The threshold is instead set from how confident the model
+# is on the correctly recognized samples of each pose, and never drops below the fixed gate.
+#
+# Warm started folds start from weights that have seen the older samples, so on warm starts the
+# report is somewhat optimistic for poses that didn't change.
+
+MAX_FOLDS = 5
+# Threads each fold's TensorFlow may use, folds run side by side
+FOLD_THREADS = 1
+# Percentile of the correct out-of-fold confidences of a pose used as its enter threshold
+THRESHOLD_PERCENTILE = 5
+# Never below the 0.90 gate poses had before smoothing or the pose filter's fallback
+THRESHOLD_RANGE = (max(0.9, FALLBACK_ENTER), 0.95)
+
+# Seconds between checks of the caller's cancel_event while folds run
+CANCEL_POLL = 0.2
+
+# Set in every fold process by init_fold_worker, stops its training when the evaluation is cancelled
+fold_cancel_event = None
+
+def init_fold_worker(threads, cancel_event):
+    global fold_cancel_event
+    fold_cancel_event = cancel_event
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    threading.Thread(target = exit_with_parent, daemon = True).start()
+
+# Folds would keep training if the process that started them was terminated, e.g. the training
+# worker when the app closes during cross-validation
+def exit_with_parent():
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        parent.join()
+        os._exit(1)
+
+# Trains on one fold's training part and returns the probabilities for its held out part.
+# previous is (weights, labels) of the model the shipped one was warm started from, or None.
+def run_fold(x_training, y_training, x_testing, label_names, previous, threads, balance="none"):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    import dataset_tools
+    import model_trainer
+
+    tf.keras.utils.set_random_seed(42)
+    previous_model, previous_labels = None, None
+    if previous is not None:
+        weights, previous_labels = previous
+        previous_model = model_trainer.build_model(x_training.shape[1], len(previous_labels))
+        previous_model.set_weights(weights)
+
+    # Split and balanced like the full training set
+    x_fit, x_validation, y_fit, y_validation = model_trainer.split_data(x_training, y_training)
+    x_fit, y_fit = dataset_tools.balance(x_fit, y_fit, balance)
+    model, _ = model_trainer.fit_classifier(x_fit, y_fit, x_validation, y_validation, label_names, previous_model, previous_labels, cancel_event=fold_cancel_event, verbose=0)
+    return model.predict(x_testing, batch_size=256, verbose=0)
+
+# THRESHOLD_PERCENTILE of the confidences of the correct predictions, rounded down to 0.01 and
+# clipped to THRESHOLD_RANGE. None without any correct prediction.
+def recommend_threshold(confidences, correct):
+    if not correct.any():
+        return None
+    threshold = np.floor(np.percentile(confidences[correct], THRESHOLD_PERCENTILE) * 100) / 100
+    return round(float(np.clip(threshold, *THRESHOLD_RANGE)), 2)
+
+def cross_validate(gestures, labels, label_names, previous=None, processes=None, progress_callback=None, cancel_event=None, balance="none"):
+    counts = np.bincount(labels, minlength=len(label_names))
+    folds = int(min(MAX_FOLDS, counts.min())) if len(counts) else 0
+    if folds < 2 or len(label_names) < 2:
+        return {"skipped": "Every pose needs at least 2 samples and there must be 2 poses to cross-validate"}
+
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(gestures, labels))
+    processes = processes or max(1, min(folds, (os.cpu_count() or 2) - 1))
+    probabilities = np.zeros((len(labels), len(label_names)), dtype=np.float32)
+    fold_accuracies = []
+
+    context = multiprocessing.get_context("spawn")
+    # cancel_event can be any event, it is relayed to the folds through one they share
+    fold_cancel = context.Event()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_fold_worker, initargs=(FOLD_THREADS, fold_cancel))
+    try:
+        futures = {
+            executor.submit(run_fold, gestures[training], labels[training], gestures[testing], label_names, previous, FOLD_THREADS, balance): testing
+            for training, testing in splits
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=CANCEL_POLL, return_when=concurrent.futures.FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                fold_cancel.set()
+                return None
+            for future in done:
+                testing = futures[future]
+                probabilities[testing] = future.result()
+                fold_accuracies.append(float(np.mean(np.argmax(probabilities[testing], axis=1) == labels[testing])))
+                if progress_callback is not None:
+                    progress_callback({"stage": "evaluation", "fold": len(fold_accuracies), "folds": folds})
+    finally:
+        # Folds that haven't started are dropped, running ones stop after their current batch
+        fold_cancel.set()
+        executor.shutdown(cancel_futures=True)
+
+    predictions = np.argmax(probabilities, axis=1)
+    confidences = probabilities.max(axis=1)
+    correct = predictions == labels
+    precision, recall, f1, support = precision_recall_fscore_support(labels, predictions, labels=range(len(label_names)), zero_division=0)
+
+    poses = {}
+    thresholds = {}
+    for index, name in enumerate(label_names):
+        recorded_as = labels == index
+        threshold = recommend_threshold(confidences[recorded_as], correct[recorded_as])
+        if threshold is not None:
+            thresholds[name] = threshold
+        poses[name] = {
+            "precision": float(precision[index]),
+            "recall": float(recall[index]),
+            "f1": float(f1[index]),
+            "support": int(support[index]),
+            "recommended_threshold": threshold
+        }
+
+    return {
+        "folds": folds,
+        "accuracy": float(np.mean(correct)),
+        "fold_accuracy_mean": float(np.mean(fold_accuracies)),
+        "fold_accuracy_std": float(np.std(fold_accuracies)),
+        "labels": label_names,
+        # Rows are the recorded pose, columns the predicted one
+        "confusion_matrix": confusion_matrix(labels, predictions, labels=range(len(label_names))).tolist(),
+        "poses": poses,
+        "recommended_threshold": recommend_threshold(confidences, correct),
+        "thresholds": thresholds,
+        "threshold_percentile": THRESHOLD_PERCENTILE
+    }
+
+def save_report(report, path):
+    with open(path + ".tmp", "w") as file:
+        json.dump(report, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def print_report(report):
+    if "skipped" in report:
+        print("Cross-validation skipped:", report["skipped"])
+        return
+    print(f"Cross-validation ({report['folds']} folds): accuracy {report['accuracy'] * 100:.2f}% "
+          f"(folds {report['fold_accuracy_mean'] * 100:.2f}% +- {report['fold_accuracy_std'] * 100:.2f}%)")
+    print(f"{'pose':<20}{'precision':>10}{'recall':>10}{'support':>9}{'threshold':>11}")
+    for name, result in report["poses"].items():
+        threshold = result["recommended_threshold"]
+        threshold = f"{threshold:.2f}" if threshold is not None else "-"
+        print(f"{name:<20}{result['precision']:>10.3f}{result['recall']:>10.3f}{result['support']:>9}{threshold:>11}")
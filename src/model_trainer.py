@@ -1,53 +1,409 @@
 import sys
+import hashlib
+import json
+import os
+import time
 import numpy as np
-import csv
 import tensorflow as tf
 from sklearn.model_selection import train_test_split
+from dataset_store import DatasetStore
+import dataset_tools
+from features import FEATURE_SCHEMA_VERSION, MOTION_SCALE, NUM_MOTION_FEATURES
+from mlp_runtime import NumpyMLP, dequantize_kernel, export_layers, quantize_kernel
+from model_artifact import ARTIFACT_PATH, EVALUATION_REPORT_PATH, ModelArtifact, save_artifact
+import model_evaluation
+import sequence_model
 from utils import resource_path
 
-def load_gesture_data():
-    gestures = []
-    labels = []
-    label_dict = {}
-    with open(resource_path('data/gestures.csv'), newline='') as file:
-        reader = csv.reader(file)
-        label_counter = 0
-        for row in reader:
-            gesture_name = row[0]
-            features = list(map(float, row[1:]))
-            if gesture_name not in label_dict:
-                label_dict[gesture_name] = label_counter
-                label_counter += 1
-            gestures.append(features)
-            labels.append(label_dict[gesture_name])
-    return np.array(gestures), np.array(labels), label_dict
+KERAS_PATH = "model/gesture_model.keras"
+BATCH_SIZE = 32
+
+# Training from scratch and warm starting from the previous model use different budgets,
+# early stopping on validation loss usually ends both well before max_epochs
+FULL_TRAINING = {"max_epochs": 150, "patience": 10, "learning_rate": 0.001}
+INCREMENTAL_TRAINING = {"max_epochs": 40, "patience": 5, "learning_rate": 0.0005}
+
+# TFLite variants written into the artifact, picked at runtime with the recognition precision setting
+TFLITE_VARIANTS = ["float32", "dynamic", "float16", "int8"]
+CALIBRATION_SAMPLES = 500
+
+def load_gesture_data(label_order = None):
+    # Samples are memory-mapped from the binary dataset store, no text parsing needed
+    return DatasetStore().load_arrays(label_order)
 
 def split_data(gestures, labels):
     x_training, x_testing, y_training, y_testing = train_test_split(gestures, labels, test_size=0.25, random_state=42)
     return x_training, x_testing, y_training, y_testing
 
-def train_model():
-    gestures, labels, label_dict = load_gesture_data()
-    x_training, x_testing, y_training, y_testing = split_data(gestures, labels)
+# Identifies the exact samples and label order a model was trained on
+def hash_training_data(gestures, labels, label_names):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(label_names).encode("utf-8"))
+    digest.update(np.ascontiguousarray(gestures, dtype=np.float32).tobytes())
+    digest.update(np.ascontiguousarray(labels, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+# Returns the previously trained keras model and its label list if it can be warm started from
+def load_previous_model():
+    artifact_path = resource_path(ARTIFACT_PATH)
+    keras_path = resource_path(KERAS_PATH)
+    if not os.path.exists(artifact_path) or not os.path.exists(keras_path):
+        return None, None
+    with ModelArtifact(artifact_path) as artifact:
+        if artifact.metadata.get("feature_schema") != FEATURE_SCHEMA_VERSION:
+            return None, None
+        labels = artifact.labels
+    return tf.keras.models.load_model(keras_path), labels
 
-    model = tf.keras.models.Sequential([
-        tf.keras.layers.Input(shape=(x_training.shape[1],)),
+def build_model(num_features, num_classes):
+    return tf.keras.models.Sequential([
+        tf.keras.layers.Input(shape=(num_features,)),
         tf.keras.layers.Dense(64, activation='relu'),
         tf.keras.layers.Dense(32, activation='relu'),
-        tf.keras.layers.Dense(len(label_dict), activation='softmax')
+        tf.keras.layers.Dense(num_classes, activation='softmax')
     ])
-    
-    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
 
-    model.fit(x_training, y_training, epochs=100, batch_size=8, validation_data=(x_testing, y_testing))
-    loss, accuracy = model.evaluate(x_testing, y_testing)
+# Copies the hidden layers of the previous model and reuses its output weights for poses that
+# still exist, only the output units of new poses start untrained
+def warm_start_model(previous_model, previous_labels, label_names):
+    model = build_model(previous_model.input_shape[-1], len(label_names))
+    for layer, previous_layer in zip(model.layers[:-1], previous_model.layers[:-1]):
+        layer.set_weights(previous_layer.get_weights())
+
+    previous_kernel, previous_bias = previous_model.layers[-1].get_weights()
+    kernel, bias = model.layers[-1].get_weights()
+    for column, name in enumerate(label_names):
+        if name in previous_labels:
+            kernel[:, column] = previous_kernel[:, previous_labels.index(name)]
+            bias[column] = previous_bias[previous_labels.index(name)]
+    model.layers[-1].set_weights([kernel, bias])
+    return model
+
+class TrainingCancelled(Exception):
+    pass
+
+# Reports epoch results and stops training early when cancel_event is set
+class ProgressCallback(tf.keras.callbacks.Callback):
+    def __init__(self, max_epochs, progress_callback=None, cancel_event=None):
+        super().__init__()
+        self.max_epochs = max_epochs
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.cancelled = False
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.cancelled = True
+            self.model.stop_training = True
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.progress_callback is not None:
+            progress = {"epoch": epoch + 1, "max_epochs": self.max_epochs}
+            progress.update({name: float(value) for name, value in (logs or {}).items()})
+            self.progress_callback(progress)
+
+def make_dataset(x, y, shuffle):
+    dataset = tf.data.Dataset.from_tensor_slices((x, y)).cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(x), seed=42, reshuffle_each_iteration=True)
+    return dataset.batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+
+# Samples, label order and the model to warm start from, shared by training and its evaluation.
+# The previous model is loaded here because installing the new one replaces its files.
+def load_training_data(incremental=True):
+    previous_model, previous_labels = load_previous_model() if incremental else (None, None)
+    # Keep the previous label order so existing output units line up with their poses
+    gestures, labels, label_dict = load_gesture_data(previous_labels)
+    label_names = sorted(label_dict, key=label_dict.get)
+    return {
+        "gestures": gestures,
+        "labels": labels,
+        "label_names": label_names,
+        "previous_model": previous_model,
+        "previous_labels": previous_labels,
+        "data_hash": hash_training_data(gestures, labels, label_names)
+    }
+
+# The training recipe of every shipped model, also used by cross-validation so the evaluated models
+# are trained the same way. Returns (model, whether it was warm started).
+def fit_classifier(x_training, y_training, x_validation, y_validation, label_names, previous_model=None, previous_labels=None, progress_callback=None, cancel_event=None, verbose="auto"):
+    can_warm_start = (
+        previous_model is not None
+        and previous_model.input_shape[-1] == x_training.shape[1]
+        and any(name in previous_labels for name in label_names)
+    )
+    if can_warm_start:
+        model = warm_start_model(previous_model, previous_labels, label_names)
+        config = INCREMENTAL_TRAINING
+    else:
+        model = build_model(x_training.shape[1], len(label_names))
+        config = FULL_TRAINING
+
+    model.compile(optimizer=tf.keras.optimizers.Adam(config["learning_rate"]), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+
+    early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=config["patience"], restore_best_weights=True)
+    progress = ProgressCallback(config["max_epochs"], progress_callback, cancel_event)
+    training_data = make_dataset(x_training, y_training, shuffle=True)
+    validation_data = make_dataset(x_validation, y_validation, shuffle=False)
+    model.fit(training_data, epochs=config["max_epochs"], validation_data=validation_data, callbacks=[early_stopping, progress], verbose=verbose)
+    if progress.cancelled:
+        raise TrainingCancelled()
+    return model, can_warm_start
+
+# Trains and writes the keras model and artifact into output_dir (the model folder by default).
+# balance is a dataset_tools strategy applied to the training samples only.
+def train_model(incremental=True, output_dir=None, progress_callback=None, cancel_event=None, balance="none", training=None):
+    training = training or load_training_data(incremental)
+    gestures, labels, label_names = training["gestures"], training["labels"], training["label_names"]
+    x_training, x_testing, y_training, y_testing = split_data(gestures, labels)
+    x_training, y_training = dataset_tools.balance(x_training, y_training, balance)
+
+    model, can_warm_start = fit_classifier(x_training, y_training, x_testing, y_testing, label_names, training["previous_model"], training["previous_labels"], progress_callback, cancel_event)
+    loss, accuracy = model.evaluate(make_dataset(x_testing, y_testing, shuffle=False))
+    print(f"Test Accuracy: {accuracy * 100:.2f}%")
+
+    output_dir = output_dir or resource_path("model")
+    model.save(os.path.join(output_dir, os.path.basename(KERAS_PATH)))
+    tflite_models, dense_layers = export_model(model, x_training)
+    variants = compare_variants(tflite_models, dense_layers, x_testing, y_testing)
+    print_variant_report(variants)
+
+    # Store the label order together with the model so they can never drift apart
+    metrics = {
+        "test_loss": float(loss),
+        "test_accuracy": float(accuracy),
+        "samples": len(gestures),
+        "warm_start": can_warm_start,
+        "variants": variants
+    }
+    sections, layer_metadata = artifact_sections(tflite_models, dense_layers)
+    save_artifact(os.path.join(output_dir, os.path.basename(ARTIFACT_PATH)), sections, {
+        "labels": label_names,
+        "mlp": layer_metadata,
+        "feature_schema": FEATURE_SCHEMA_VERSION,
+        "data_hash": training["data_hash"],
+        "metrics": metrics,
+        "created": time.time()
+    })
+    # print("Model saved as gesture_model.artifact")
+    return metrics
+
+# Cross-validates the training recipe on the data a model was trained on and writes the report into
+# output_dir. Runs after the model is installed, the report is matched to it by the data hash.
+def evaluate_model(training, output_dir=None, processes=None, progress_callback=None, cancel_event=None, balance="none"):
+    previous = None
+    if training["previous_model"] is not None:
+        previous = (training["previous_model"].get_weights(), training["previous_labels"])
+    report = model_evaluation.cross_validate(training["gestures"], training["labels"], training["label_names"], previous, processes, progress_callback, cancel_event, balance)
+    if report is None:
+        raise TrainingCancelled()
+    report["data_hash"] = training["data_hash"]
+    model_evaluation.print_report(report)
+    output_dir = output_dir or resource_path("model")
+    model_evaluation.save_report(report, os.path.join(output_dir, os.path.basename(EVALUATION_REPORT_PATH)))
+    return report
+
+# Every TFLite variant of a keras model and its dense layers as (kernel, bias, activation)
+def export_model(model, calibration_samples):
+    tflite_models = {variant: convert_tflite(model, variant, calibration_samples) for variant in TFLITE_VARIANTS}
+    dense_layers = [(*layer.get_weights(), layer.activation.__name__) for layer in model.layers if isinstance(layer, tf.keras.layers.Dense)]
+    return tflite_models, dense_layers
 
-    # print(f"Test Accuracy: {accuracy * 100:.2f}%")
-    
-    model.save(resource_path("model/gesture_model.keras"))
+# Artifact sections and the "mlp" metadata for the output of export_model
+def artifact_sections(tflite_models, dense_layers):
+    # Dense weights for the NumPy runtime, which spares recognition the TensorFlow import
+    layer_sections, layer_metadata = export_layers(dense_layers)
+    tflite_sections = {tflite_section(variant): content for variant, content in tflite_models.items()}
+    return {**tflite_sections, **layer_sections}, layer_metadata
+
+# Writes the artifact for a model trained before artifacts existed, from its keras file and the
+# labels in poses.txt, so it can run on the NumPy runtime without retraining
+def convert_legacy_model(keras_path=resource_path(KERAS_PATH), labels_path=resource_path("data/poses.txt"), artifact_path=resource_path(ARTIFACT_PATH)):
+    model = tf.keras.models.load_model(keras_path)
+    with open(labels_path, "r") as file:
+        label_names = [line.strip() for line in file if line.strip()]
+    if model.output_shape[-1] != len(label_names):
+        raise ValueError(f"{keras_path} has {model.output_shape[-1]} outputs but {labels_path} lists {len(label_names)} poses")
+
+    # The int8 variant is calibrated on the recorded samples
+    gestures, _, _ = load_gesture_data()
+    if not len(gestures):
+        gestures = np.zeros((1, model.input_shape[-1]), dtype=np.float32)
+    sections, layer_metadata = artifact_sections(*export_model(model, gestures))
+    save_artifact(artifact_path, sections, {
+        "labels": label_names,
+        "mlp": layer_metadata,
+        "feature_schema": FEATURE_SCHEMA_VERSION,
+        "converted_from": os.path.basename(keras_path),
+        "created": time.time()
+    })
+
+def tflite_section(variant):
+    return "tflite" if variant == "float32" else "tflite_" + variant
+
+# dynamic: int8 weights with float activations, float16: half precision weights,
+# int8: weights and activations in int8, calibrated on recorded samples (inputs and outputs stay float)
+def convert_tflite(model, variant, calibration_samples=None):
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    tflite_model = converter.convert()
+    if variant != "float32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        samples = np.asarray(calibration_samples[:CALIBRATION_SAMPLES], dtype=np.float32)
+        converter.representative_dataset = lambda: ([sample[np.newaxis]] for sample in samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+# Mean latency in microseconds of classifying a single hand
+def measure_latency(classify, samples, repeats=500):
+    if not len(samples):
+        samples = np.zeros((1, samples.shape[1]), dtype=np.float32)
+    classify(samples[:1])
+    start = time.perf_counter()
+    for index in range(repeats):
+        row = index % len(samples)
+        classify(samples[row:row + 1])
+    return (time.perf_counter() - start) / repeats * 1e6
+
+# Test accuracy, single hand latency and size of every TFLite variant and both NumPy precisions
+def compare_variants(tflite_models, dense_layers, x_testing, y_testing):
+    x_testing = np.asarray(x_testing, dtype=np.float32)
+    runtimes = {}
+    for variant, content in tflite_models.items():
+        interpreter = tf.lite.Interpreter(model_content=content)
+        interpreter.allocate_tensors()
+        input_index = interpreter.get_input_details()[0]['index']
+        output_index = interpreter.get_output_details()[0]['index']
+
+        def classify(batch, interpreter=interpreter, input_index=input_index, output_index=output_index):
+            interpreter.set_tensor(input_index, batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_index)
+        runtimes["tflite_" + variant] = (classify, len(content))
+
+    quantized_layers = [(dequantize_kernel(*quantize_kernel(kernel)), bias, activation) for kernel, bias, activation in dense_layers]
+    for precision, layers in [("float32", dense_layers), ("int8", quantized_layers)]:
+        mlp = NumpyMLP([(np.asarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32), activation) for kernel, bias, activation in layers])
+        itemsize = 4 if precision == "float32" else 1
+        runtimes["numpy_" + precision] = (mlp.classify, sum(kernel.size * itemsize + bias.size * 4 for kernel, bias, _ in layers))
+
+    report = {}
+    for name, (classify, size) in runtimes.items():
+        predictions = np.array([np.argmax(classify(sample[np.newaxis])) for sample in x_testing])
+        report[name] = {
+            "accuracy": float(np.mean(predictions == y_testing)) if len(x_testing) else 0.0,
+            "latency_us": measure_latency(classify, x_testing),
+            "size_bytes": int(size)
+        }
+    return report
+
+def print_variant_report(variants):
+    print(f"{'variant':<16}{'accuracy':>10}{'latency':>12}{'size':>10}")
+    for name, result in variants.items():
+        print(f"{name:<16}{result['accuracy'] * 100:>9.2f}%{result['latency_us']:>10.1f}us{result['size_bytes'] / 1024:>8.1f}KB")
+
+def load_sequence_data():
+    store = DatasetStore(resource_path(sequence_model.SEQUENCE_DATASET_DIR), csv_file=None, sample_shape=(sequence_model.SEQUENCE_LENGTH, NUM_MOTION_FEATURES))
+    return store.load_arrays()
+
+def has_sequence_data():
+    return len(load_sequence_data()[2]) > 0
+
+# "No motion" examples for the motion model: recorded poses held still with a little wrist jitter
+def make_background_sequences(count, seed=42):
+    poses, _, _ = load_gesture_data()
+    rng = np.random.default_rng(seed)
+    if not len(poses):
+        return np.empty((0, sequence_model.SEQUENCE_LENGTH, NUM_MOTION_FEATURES), dtype=np.float32)
+    picked = poses[rng.integers(0, len(poses), size=count)]
+    sequences = np.zeros((count, sequence_model.SEQUENCE_LENGTH, NUM_MOTION_FEATURES), dtype=np.float32)
+    sequences[:, :, :poses.shape[1]] = picked[:, np.newaxis]
+    # About 0.02 palm lengths of wrist jitter per frame
+    sequences[:, :, poses.shape[1]:] = rng.normal(0, 0.02 * MOTION_SCALE, size=(count, sequence_model.SEQUENCE_LENGTH, 2))
+    return sequences
+
+def build_sequence_model(num_features, num_classes):
+    layers = [tf.keras.layers.Input(shape=(sequence_model.SEQUENCE_LENGTH, num_features))]
+    for dilation in sequence_model.DILATIONS:
+        layers.append(tf.keras.layers.Conv1D(sequence_model.FILTERS, sequence_model.KERNEL_SIZE, dilation_rate=dilation, padding='causal', activation='relu'))
+    # Only the last time step is classified, it is the one the live stream computes
+    layers += [
+        tf.keras.layers.Cropping1D((sequence_model.SEQUENCE_LENGTH - 1, 0)),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(num_classes, activation='softmax')
+    ]
+    return tf.keras.models.Sequential(layers)
+
+# Trains the motion model on recorded sequences and writes its weights as an artifact that the
+# NumPy streaming runtime in sequence_model.py loads
+def train_sequence_model(output_dir=None, progress_callback=None, cancel_event=None):
+    sequences, labels, label_dict = load_sequence_data()
+    if not len(sequences):
+        raise ValueError("No motion sequences have been recorded")
+    label_names = sorted(label_dict, key=label_dict.get)
+
+    background = make_background_sequences(max(np.bincount(labels).max(), 1))
+    if len(background):
+        sequences = np.concatenate([sequences, background])
+        labels = np.concatenate([labels, np.full(len(background), len(label_names), dtype=np.int32)])
+        label_names.append(sequence_model.BACKGROUND_LABEL)
+    x_training, x_testing, y_training, y_testing = split_data(sequences, labels)
+
+    config = FULL_TRAINING
+    model = build_sequence_model(NUM_MOTION_FEATURES, len(label_names))
+    model.compile(optimizer=tf.keras.optimizers.Adam(config["learning_rate"]), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+
+    early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=config["patience"], restore_best_weights=True)
+    progress = ProgressCallback(config["max_epochs"], progress_callback, cancel_event)
+    training_data = make_dataset(x_training, y_training, shuffle=True)
+    testing_data = make_dataset(x_testing, y_testing, shuffle=False)
+    model.fit(training_data, epochs=config["max_epochs"], validation_data=testing_data, callbacks=[early_stopping, progress])
+    if progress.cancelled:
+        raise TrainingCancelled()
+    loss, accuracy = model.evaluate(testing_data)
+
+    output_dir = output_dir or resource_path("model")
+    model.save(os.path.join(output_dir, os.path.basename(sequence_model.SEQUENCE_KERAS_PATH)))
+
+    sections = {}
+    convolutions = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.Conv1D)]
+    for index, layer in enumerate(convolutions):
+        kernel, bias = layer.get_weights()
+        sections[f"conv{index}.kernel"] = kernel.astype(np.float32)
+        sections[f"conv{index}.bias"] = bias.astype(np.float32)
+    kernel, bias = model.layers[-1].get_weights()
+    sections["output.kernel"] = kernel.astype(np.float32)
+    sections["output.bias"] = bias.astype(np.float32)
+
+    metrics = {
+        "test_loss": float(loss),
+        "test_accuracy": float(accuracy),
+        "samples": len(sequences)
+    }
+    save_artifact(os.path.join(output_dir, os.path.basename(sequence_model.SEQUENCE_ARTIFACT_PATH)), {name: array.tobytes() for name, array in sections.items()}, {
+        "labels": label_names,
+        "feature_schema": FEATURE_SCHEMA_VERSION,
+        "kernel_size": sequence_model.KERNEL_SIZE,
+        "dilations": list(sequence_model.DILATIONS),
+        "sequence_length": sequence_model.SEQUENCE_LENGTH,
+        "shapes": {name: list(array.shape) for name, array in sections.items()},
+        "data_hash": hash_training_data(sequences, labels, label_names),
+        "metrics": metrics,
+        "created": time.time()
+    })
+    return metrics
+
+if __name__ == "__main__":
+    import argparse
+    parser=argparse.ArgumentParser(description="Train the gesture model or convert a model trained before artifacts existed")
+    parser.add_argument("command", choices=["train", "convert"])
+    parser.add_argument("--model-dir", default=resource_path("model"))
+    args=parser.parse_args()
 
-    with open(resource_path("model/gesture_model.tflite"), "wb") as f:
-        f.write(tflite_model)
-    # print("Model saved as gesture_model.tflite")
+    if args.command == "train":
+        training=load_training_data()
+        train_model(output_dir=args.model_dir, training=training)
+        evaluate_model(training, output_dir=args.model_dir)
+    else:
+        convert_legacy_model(os.path.join(args.model_dir, os.path.basename(KERAS_PATH)), artifact_path=os.path.join(args.model_dir, os.path.basename(ARTIFACT_PATH)))
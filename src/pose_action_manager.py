@@ -1,44 +1,84 @@
 import json
+import os
+import threading
+import time
+from types import MappingProxyType
 from utils import resource_path
 
 class PoseActionManager():
-    def __init__(self):
-        self.mappings = self.load_mappings()
+    # How often get_pose_action may stat mappings.json for outside changes
+    CHECK_INTERVAL = 0.5
+
+    def __init__(self, mappings_file = resource_path("data/mappings.json")):
+        self.mappings_file = mappings_file
+        self.write_lock = threading.Lock()
+        self.mappings = MappingProxyType({})
+        self.mtime = None
+        self.last_check = 0
+        self.reload()
 
     def load_mappings(self):
         try:
-            with open(resource_path("data/mappings.json"), "r") as file:
+            with open(self.mappings_file, "r") as file:
                 data = json.load(file)
                 return data
         except FileNotFoundError:
             print("Warning: mappings.json not found. Using empty mappings dictionary.")
             return {}
-        
-    def save_mappings(self):
-        with open(resource_path("data/mappings.json"), "w") as file:
-            json.dump(self.mappings, file)
-    
+
+    def get_mtime(self):
+        try:
+            return os.path.getmtime(self.mappings_file)
+        except OSError:
+            return None
+
+    def reload(self):
+        self.mtime = self.get_mtime()
+        self.publish(self.load_mappings())
+
+    # Readers only ever see a complete read-only snapshot which is swapped in with one assignment
+    def publish(self, mappings):
+        self.mappings = MappingProxyType(dict(mappings))
+
+    def check_for_changes(self):
+        now = time.monotonic()
+        if now - self.last_check < self.CHECK_INTERVAL:
+            return
+        self.last_check = now
+        if self.get_mtime() != self.mtime:
+            self.reload()
+
+    def save_mappings(self, mappings):
+        # Write to a temporary file first so the file is never seen half written
+        temp_file = self.mappings_file + ".tmp"
+        with open(temp_file, "w") as file:
+            json.dump(mappings, file)
+        os.replace(temp_file, self.mappings_file)
+        self.mtime = self.get_mtime()
+        self.publish(mappings)
+
     def get_pose_action(self, pose):
-        self.mappings = self.load_mappings()
+        self.check_for_changes()
         return self.mappings.get(pose)
-    
+
     def set_pose_action(self, pose, action):
-        self.mappings[pose] = action
-        self.save_mappings()
+        with self.write_lock:
+            mappings = dict(self.mappings)
+            mappings[pose] = action
+            self.save_mappings(mappings)
 
     def delete_mapping(self, pose):
-        self.mappings[pose] = ""
-        self.save_mappings()
+        self.set_pose_action(pose, "")
 
     def delete_pose(self, pose):
-        self.mappings.pop(pose)
-        self.save_mappings()
+        with self.write_lock:
+            mappings = dict(self.mappings)
+            mappings.pop(pose, None)
+            self.save_mappings(mappings)
 
     def get_mappings(self):
-        self.mappings = self.load_mappings()
+        self.check_for_changes()
         return self.mappings
-    
+
     def add_pose(self, pose):
-        self.mappings[pose] = ""
-        self.save_mappings()
-        
\ No newline at end of file
+        self.set_pose_action(pose, "")
@@ -1,24 +1,23 @@
-import cv2
-import mediapipe as mp
-import numpy as np
-from gesture_manager import GestureManager
+import queue
+from features import extract_features
+from sequence_model import SEQUENCE_LENGTH
 
 class GestureRecorder:
-    def __init__(self, camera_manager):
-        self.mp_hands = mp.solutions.hands
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.hands = self.mp_hands.Hands(
-            max_num_hands = 1,
-            model_complexity = 0,
-            min_detection_confidence = 0.5,
-            min_tracking_confidence = 0.5
-        )
+    # With motion = True every recorded sample is the hand's next SEQUENCE_LENGTH frames. root is the
+    # Tk root, captured motions are saved from its thread.
+    def __init__(self, gesture_controller, gesture_manager, motion = False, root = None):
         self.running = False
         self.reading = False
         self.pose_name = None
-        self.gesture_manager = GestureManager()
-        self.camera_manager = camera_manager
-        self.current_landmarks = None
+        self.gesture_manager = gesture_manager
+        self.gesture_controller = gesture_controller
+        self.current_hand = None
+        self.motion = motion
+        self.motion_frames_left = 0
+        self.motion_hand = None
+        # (name, window) of motions captured on the controller thread and not saved yet
+        self.captured = queue.Queue()
+        self.root = root
 
     def start_recording(self, pose_name):
         self.pose_name = pose_name
@@ -29,52 +28,67 @@ class GestureRecorder:
         self.reading = False
 
     def record_frame(self):
-        if self.reading and self.current_landmarks:
-            processed = self.process_landmarks(self.current_landmarks)
-            self.gesture_manager.add_pose(self.pose_name, processed)
-    
-    def run(self):
+        hand = self.current_hand
+        if self.reading and hand:
+            if self.motion:
+                # The motion is captured over the following frames by on_result
+                if not self.motion_frames_left:
+                    self.motion_hand = hand.handedness
+                    self.motion_frames_left = SEQUENCE_LENGTH
+                return
+            processed = extract_features(hand.landmarks, hand.handedness)
+            self.gesture_manager.add_pose(self.pose_name, processed[0].tolist())
+
+    def is_capturing(self):
+        return self.motion_frames_left > 0
+
+    # Samples the results of the gesture controller instead of running hand detection again
+    def on_result(self, result):
+        if result.hands:
+            self.current_hand = result.hands[0]
+        else:
+            self.current_hand = None
+        if self.motion_frames_left:
+            self.capture_motion(result)
+
+    # Called on the controller thread, which also fills the hand's motion window. Saving writes to
+    # disk and shares the dataset store with the Tk thread, so it is left to save_captured.
+    def capture_motion(self, result):
+        if not any(hand.handedness == self.motion_hand for hand in result.hands):
+            print("Hand lost, motion not recorded")
+            self.motion_frames_left = 0
+            return
+        self.motion_frames_left -= 1
+        window = self.gesture_controller.hand_states[self.motion_hand].motion_window
+        if not self.motion_frames_left and self.reading and window.is_full():
+            self.captured.put((self.pose_name, window.snapshot()))
+
+    # Runs on the Tk thread
+    def save_captured(self):
+        while True:
+            try:
+                name, window = self.captured.get_nowait()
+            except queue.Empty:
+                break
+            self.gesture_manager.add_motion(name, window)
+
+    def poll_captured(self):
+        if self.running:
+            self.save_captured()
+            self.root.after(100, self.poll_captured)
+
+    def start(self):
         self.running = True
-        while self.running:
-            frame = self.camera_manager.get_frame()
-            if frame is None:
-                continue
-            
-            # Convert frame to RGB (for MediaPipe)
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame.flags.writeable = False
-            results = self.hands.process(frame)
-            frame.flags.writeable = True
+        self.gesture_controller.subscribe(self.on_result)
+        if self.motion and self.root is not None:
+            self.poll_captured()
 
-            # Convert back to BGR for OpenCV display
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    self.current_landmarks = hand_landmarks
-            else:
-                self.current_landmarks = None
-    
     def stop(self):
+        if self.running:
+            self.gesture_controller.unsubscribe(self.on_result)
+            self.save_captured()
+            self.gesture_manager.flush()
         self.running = False
         self.reading = False
+        self.motion_frames_left = 0
 
-    def process_landmarks(self, hand_landmarks):
-        landmarks = []
-        
-        # Extract x and y coordinates of each landmark normalized to wrist position
-        for landmark in hand_landmarks.landmark:
-            xCoordinate = landmark.x - hand_landmarks.landmark[0].x 
-            yCoordinate = landmark.y - hand_landmarks.landmark[0].y
-            landmarks.append([xCoordinate, yCoordinate])
-
-        # Flatten landmarks into 1D list
-        flattened_landmarks = np.array(landmarks).flatten().tolist()
-
-        # Normalize landmarks into -1 to 1 range based on max absolute value
-        processed_landmarks = []
-        max_val = max([abs(num) for num in flattened_landmarks]) # Get the max absolute value
-        if max_val == 0:
-            max_val = 1
-        processed_landmarks = (np.array(flattened_landmarks) / max_val).tolist() # Divide every number by the max absolute value
-
-        return processed_landmarks
\ No newline at end of file
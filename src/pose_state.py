@@ -0,0 +1,108 @@
+import numpy as np
+
+DEFAULT_POSE_CONFIG = {
+    # Smoothed confidence needed to enter a pose and the level it has to fall below to leave it.
+    # "auto" uses the threshold the trainer's cross-validation recommended for the pose.
+    "enter": "auto",
+    "exit": 0.6,
+    # Seconds a pose has to be held before it becomes active
+    "dwell": 0.1,
+    # Seconds before the action of this pose can fire again
+    "cooldown": 0.5
+}
+# Enter threshold for "auto" when the model has no recommendation for a pose
+FALLBACK_ENTER = 0.85
+
+# Settings of one pose from the pose_filter config, falling back to the defaults
+def get_pose_config(config, pose):
+    config = config or {}
+    return dict(DEFAULT_POSE_CONFIG, **config.get("default", {}), **config.get("poses", {}).get(pose, {}))
+
+# Turns noisy per-frame class probabilities into a stable pose for one hand. Probabilities are
+# averaged with an exponential moving average, a pose becomes active once its average passed the
+# enter threshold for the dwell time and stays active until it drops below the exit threshold.
+class PoseStateMachine:
+    def __init__(self, config = None):
+        self.config = config or {}
+        # Weight of the newest frame in the moving average, 1 disables smoothing
+        self.smoothing = self.config.get("smoothing", 0.35)
+        self.pose_configs = {}
+        self.labels = None
+        self.thresholds = {}
+        self.reset()
+
+    def reset(self):
+        self.average = None
+        self.active = None
+        self.candidate = None
+        self.candidate_since = None
+
+    def get_pose_config(self, pose):
+        if pose not in self.pose_configs:
+            config = get_pose_config(self.config, pose)
+            if config["enter"] == "auto":
+                config["enter"] = self.thresholds.get(pose, FALLBACK_ENTER)
+                config["exit"] = min(config["exit"], config["enter"])
+            self.pose_configs[pose] = config
+        return self.pose_configs[pose]
+
+    # The moving average rearranged for a new label list, poses the old model didn't know start
+    # from the new probabilities
+    def remap_average(self, labels, probabilities):
+        if self.average is None or self.labels is None:
+            return None
+        average = np.array(probabilities, dtype = np.float32)
+        for index, pose in enumerate(labels):
+            if pose in self.labels and index < len(average):
+                average[index] = self.average[self.labels.index(pose)]
+        return average
+
+    # Returns (pose name or "Unknown", smoothed confidence, whether the pose was just entered).
+    # thresholds are the model's recommended enter thresholds by pose.
+    def update(self, probabilities, labels, timestamp, thresholds = None):
+        # A reloaded model can have different classes and thresholds. The average and the active pose
+        # carry over by pose name, so a pose held through the reload neither drops out nor fires again.
+        if labels is not self.labels:
+            self.thresholds = thresholds or {}
+            self.pose_configs = {}
+            self.average = self.remap_average(labels, probabilities)
+            self.labels = labels
+            if self.active not in labels:
+                self.active = None
+            if self.candidate not in labels:
+                self.candidate = None
+        if self.average is None or len(self.average) != len(probabilities):
+            self.reset()
+            self.average = np.array(probabilities, dtype = np.float32)
+        else:
+            self.average += self.smoothing * (probabilities - self.average)
+
+        best_idx = int(np.argmax(self.average))
+        best_pose = labels[best_idx] if best_idx < len(labels) else "Unknown"
+        best_confidence = float(self.average[best_idx])
+
+        # Hysteresis: the active pose is kept until its own average drops below its exit threshold
+        if self.active is not None:
+            active_idx = labels.index(self.active) if self.active in labels else None
+            if active_idx is None or self.average[active_idx] < self.get_pose_config(self.active)["exit"]:
+                self.active = None
+            elif best_pose == self.active:
+                self.candidate = None
+                return self.active, best_confidence, False
+
+        entered = False
+        if best_pose != "Unknown" and best_confidence >= self.get_pose_config(best_pose)["enter"]:
+            if self.candidate != best_pose:
+                self.candidate = best_pose
+                self.candidate_since = timestamp
+            if timestamp - self.candidate_since >= self.get_pose_config(best_pose)["dwell"]:
+                self.active = best_pose
+                self.candidate = None
+                entered = True
+        else:
+            self.candidate = None
+
+        if self.active is None:
+            return "Unknown", best_confidence, False
+        active_confidence = float(self.average[labels.index(self.active)])
+        return self.active, active_confidence, entered
@@ -0,0 +1,156 @@
+import os
+import numpy as np
+from features import FEATURE_SCHEMA_VERSION, NUM_MOTION_FEATURES, extract_motion_features
+from model_artifact import ModelArtifact
+from utils import resource_path
+
+# Motion gestures (swipes, circles, waves) are recognized by a small temporal convolution network
+# over the last SEQUENCE_LENGTH frames of motion features. The convolutions are causal and dilated,
+# so the prediction for a frame only depends on that frame and the ones before it. That lets the
+# live path keep the past activations of every layer and compute one new time step per frame
+# instead of re-running the whole window.
+
+SEQUENCE_ARTIFACT_PATH = "model/sequence_model.artifact"
+SEQUENCE_KERAS_PATH = "model/sequence_model.keras"
+SEQUENCE_DATASET_DIR = "data/sequences"
+
+KERNEL_SIZE = 3
+DILATIONS = (1, 2, 4, 8)
+FILTERS = 32
+# Frames one prediction looks at, the receptive field of the convolution stack
+SEQUENCE_LENGTH = 1 + (KERNEL_SIZE - 1) * sum(DILATIONS)
+
+# Label of the "no motion" class the trainer adds from still pose samples
+BACKGROUND_LABEL = "Unknown"
+
+DEFAULT_MOTION_CONFIG = {
+    # Probability a motion needs before it fires
+    "threshold": 0.9,
+    # Seconds after a motion fired during which the hand can't fire another one
+    "refractory": 1.0
+}
+
+# Fixed size ring buffer of a hand's most recent motion feature frames, used for recording
+class MotionWindow:
+    def __init__(self, length = SEQUENCE_LENGTH):
+        self.frames = np.zeros((length, NUM_MOTION_FEATURES), dtype = np.float32)
+        self.reset()
+
+    def reset(self):
+        self.position = 0
+        self.count = 0
+        self.previous = None
+
+    # Adds the frame's motion features and returns them
+    def push(self, features, hand_landmarks):
+        row = self.frames[self.position]
+        _, self.previous = extract_motion_features(features, hand_landmarks, self.previous, row)
+        self.position = (self.position + 1) % len(self.frames)
+        self.count += 1
+        return row
+
+    def is_full(self):
+        return self.count >= len(self.frames)
+
+    # Copy of the window, oldest frame first
+    def snapshot(self):
+        return np.roll(self.frames, -self.position, axis = 0)
+
+# Trained weights of the motion model. Never changed after loading, reloading swaps the reference.
+class SequenceModel:
+    def __init__(self, layers, output, labels, metadata = None):
+        # layers is a list of (kernel (KERNEL_SIZE, in, out), bias, dilation), output is (kernel, bias)
+        self.layers = layers
+        self.output = output
+        self.labels = labels
+        self.metadata = metadata or {}
+        self.background = labels.index(BACKGROUND_LABEL) if BACKGROUND_LABEL in labels else None
+
+    # Returns None when no motion model has been trained yet
+    @classmethod
+    def load(cls, artifact_path = resource_path(SEQUENCE_ARTIFACT_PATH)):
+        if not os.path.exists(artifact_path):
+            return None
+        with ModelArtifact(artifact_path) as artifact:
+            metadata = artifact.metadata
+            if metadata.get("feature_schema") != FEATURE_SCHEMA_VERSION:
+                print("Warning: motion model was trained on a different feature schema. Retrain to fix predictions.")
+            shapes = metadata["shapes"]
+
+            # Copied out of the mapping so the file isn't kept open
+            def weights(name):
+                return np.frombuffer(artifact.section(name), dtype = np.float32).reshape(shapes[name]).copy()
+
+            layers = [
+                (weights(f"conv{index}.kernel"), weights(f"conv{index}.bias"), dilation)
+                for index, dilation in enumerate(metadata["dilations"])
+            ]
+            output = (weights("output.kernel"), weights("output.bias"))
+            return cls(layers, output, artifact.labels, metadata)
+
+    def new_stream(self):
+        return SequenceStream(self)
+
+# Streaming evaluation of a SequenceModel for one hand. Every layer keeps a ring of the inputs its
+# dilated kernel still needs, so each frame costs one time step of every layer.
+class SequenceStream:
+    def __init__(self, model):
+        self.model = model
+        self.buffers = []
+        for kernel, bias, dilation in model.layers:
+            self.buffers.append(np.zeros(((KERNEL_SIZE - 1) * dilation + 1, kernel.shape[1]), dtype = np.float32))
+        self.position = 0
+
+    def reset(self):
+        for buffer in self.buffers:
+            buffer.fill(0)
+        self.position = 0
+
+    # Feeds one frame of motion features and returns the class probabilities for it
+    def step(self, frame):
+        x = frame
+        for (kernel, bias, dilation), buffer in zip(self.model.layers, self.buffers):
+            size = len(buffer)
+            buffer[self.position % size] = x
+            # Causal convolution: tap j sees the input (KERNEL_SIZE - 1 - j) * dilation frames back
+            y = bias.copy()
+            for tap in range(KERNEL_SIZE):
+                y += buffer[(self.position - (KERNEL_SIZE - 1 - tap) * dilation) % size] @ kernel[tap]
+            x = np.maximum(y, 0)
+        self.position += 1
+
+        kernel, bias = self.model.output
+        logits = x @ kernel + bias
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+# Turns a hand's stream of motion predictions into single motion events
+class MotionDetector:
+    def __init__(self, config = None):
+        self.config = dict(DEFAULT_MOTION_CONFIG, **(config or {}))
+        self.stream = None
+        self.frames = 0
+        self.last_fired = float("-inf")
+
+    def reset(self):
+        if self.stream is not None:
+            self.stream.reset()
+        self.frames = 0
+
+    # Returns the motion that fired on this frame or None
+    def update(self, model, frame, timestamp):
+        # A reloaded model starts a fresh stream
+        if self.stream is None or self.stream.model is not model:
+            self.stream = model.new_stream()
+            self.frames = 0
+        probabilities = self.stream.step(frame)
+        self.frames += 1
+
+        # Predictions are only meaningful once the window is filled with real frames
+        if self.frames < SEQUENCE_LENGTH or timestamp - self.last_fired < self.config["refractory"]:
+            return None
+        index = int(np.argmax(probabilities))
+        if index == model.background or probabilities[index] < self.config["threshold"]:
+            return None
+        self.last_fired = timestamp
+        return model.labels[index]
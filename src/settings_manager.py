@@ -1,5 +1,6 @@
 import sys
 import os
+import json
 from utils import resource_path
 
 class SettingsManager:
@@ -7,6 +8,16 @@ class SettingsManager:
         self.webcam_index = self.get_webcam_index_setting()
         self.display_help = self.get_display_help_setting()
 
+    # Advanced options live in config.json, anything missing there falls back to the defaults
+    def get_config(self, section, defaults = None):
+        config = dict(defaults or {})
+        try:
+            with open(resource_path("data/config.json"), "r") as file:
+                config.update(json.load(file).get(section, {}))
+        except FileNotFoundError:
+            pass
+        return config
+
     def get_webcam_index_setting(self):
         with open(resource_path("data/settings.txt"), "r") as file:
             index = int(file.readline().strip())
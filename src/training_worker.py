@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import queue
+import shutil
+from model_artifact import ARTIFACT_PATH, EVALUATION_REPORT_PATH
+from sequence_model import SEQUENCE_ARTIFACT_PATH, SEQUENCE_KERAS_PATH
+from utils import resource_path
+
+# Threads TensorFlow may use while training so recognition and the GUI keep a core to themselves
+TRAINING_THREADS = 2
+STAGING_DIR = "model/staging"
+MODEL_FILES = [ARTIFACT_PATH, "model/gesture_model.keras", EVALUATION_REPORT_PATH, SEQUENCE_ARTIFACT_PATH, SEQUENCE_KERAS_PATH]
+
+# Entry point of the worker process, messages are (kind, payload) tuples
+def run_training(messages, cancel_event, output_dir, threads, balance):
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    import model_trainer
+
+    try:
+        training = model_trainer.load_training_data()
+        metrics = model_trainer.train_model(
+            output_dir = output_dir,
+            progress_callback = lambda progress: messages.put(("progress", progress)),
+            cancel_event = cancel_event,
+            balance = balance,
+            training = training
+        )
+        # The motion model is only trained once motion sequences have been recorded
+        if model_trainer.has_sequence_data():
+            metrics["sequence"] = model_trainer.train_sequence_model(
+                output_dir = output_dir,
+                progress_callback = lambda progress: messages.put(("progress", dict(progress, stage = "motion"))),
+                cancel_event = cancel_event
+            )
+        messages.put(("done", metrics))
+
+        # The new model is installed and used while it is cross-validated in the background
+        report = model_trainer.evaluate_model(
+            training,
+            output_dir = output_dir,
+            # Cross-validation folds share the training thread budget
+            processes = threads,
+            progress_callback = lambda progress: messages.put(("progress", progress)),
+            cancel_event = cancel_event,
+            balance = balance
+        )
+        messages.put(("evaluated", report))
+    except model_trainer.TrainingCancelled:
+        messages.put(("cancelled", None))
+    except Exception as e:
+        messages.put(("error", str(e)))
+
+# Runs model_trainer.train_model in a separate process. The new model is written to a staging
+# folder and only moved over the live model files by install() once training succeeded ("done").
+# The worker then cross-validates it and sends "evaluated" once the report is staged as well.
+class TrainingProcess:
+    # balance is the dataset_tools strategy that evens out pose counts for training
+    def __init__(self, threads = TRAINING_THREADS, balance = "none"):
+        self.context = multiprocessing.get_context("spawn")
+        self.threads = threads
+        self.balance = balance
+        self.messages = self.context.Queue()
+        self.cancel_event = self.context.Event()
+        self.process = None
+        self.staging_dir = resource_path(STAGING_DIR)
+
+    def start(self):
+        shutil.rmtree(self.staging_dir, ignore_errors = True)
+        os.makedirs(self.staging_dir)
+        self.process = self.context.Process(
+            target = run_training,
+            args = (self.messages, self.cancel_event, self.staging_dir, self.threads, self.balance),
+            # Not a daemon, daemonic processes can't start the cross-validation fold processes
+            daemon = False
+        )
+        self.process.start()
+
+    def is_running(self):
+        return self.process is not None and self.process.is_alive()
+
+    # Returns all messages received so far without blocking
+    def poll(self):
+        received = []
+        while True:
+            try:
+                received.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        # A worker that died without reporting (e.g. crashed while importing) still has to end the training
+        if not received and self.process is not None and self.process.exitcode not in (None, 0):
+            received.append(("error", "Training process exited with code " + str(self.process.exitcode)))
+        return received
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    # Replaces the live model files with the staged ones, called after "done" and again after "evaluated"
+    def install(self):
+        for path in MODEL_FILES:
+            staged = os.path.join(self.staging_dir, os.path.basename(path))
+            if os.path.exists(staged):
+                os.replace(staged, resource_path(path))
+
+    # Removes the staging folder once the worker has finished
+    def cleanup(self):
+        shutil.rmtree(self.staging_dir, ignore_errors = True)
+
+    def join(self, timeout = None):
+        if self.process is not None:
+            self.process.join(timeout)
+
+    # Used when the app closes during training, the worker isn't a daemon so it has to be ended here
+    def stop(self, timeout = 10):
+        self.cancel()
+        self.join(timeout)
+        if self.is_running():
+            self.process.terminate()
+            self.join()
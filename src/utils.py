@@ -6,4 +6,19 @@ def resource_path(relative_path):
         base_path = sys._MEIPASS
     except Exception:
         base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
\ No newline at end of file
+    return os.path.join(base_path, relative_path)
+
+# MediaPipe imports TensorFlow for documentation decorators only, whenever it is installed. Hiding
+# TensorFlow while MediaPipe loads keeps it out of the app until training actually needs it.
+def import_mediapipe():
+    if "mediapipe" in sys.modules:
+        return sys.modules["mediapipe"]
+    hide = "tensorflow" not in sys.modules
+    if hide:
+        sys.modules["tensorflow"] = None
+    try:
+        import mediapipe
+    finally:
+        if hide and sys.modules.get("tensorflow", 0) is None:
+            del sys.modules["tensorflow"]
+    return mediapipe